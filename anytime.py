@@ -0,0 +1,295 @@
+"""
+Weighted and Anytime Search
+---------------------------
+Searches that give up some optimality to find a solution faster.
+
+Weighted A* orders the frontier by g + w * h instead of g + h, for a weight
+w of at least 1, which makes it greedier: it dives towards states that look
+close to the goal. Since the heuristics are consistent, the solution costs
+at most w times the optimal cost, even though visited states are never
+reopened ("ARA*: Anytime A* with Provable Bounds on Sub-Optimality",
+Likhachev, Gordon and Thrun).
+
+The anytime search (ARA*) runs weighted A* with a weight that goes down
+after each solution, reusing the work of the previous searches, until the
+weight is 1 (and the solution is optimal) or the budget runs out. States
+whose cost went down after they were visited are kept aside (they are
+inconsistent) and put back in the frontier for the next search. After
+each search, the cost of the solution divided by the lowest g + h in the
+frontier and among the inconsistent states is a bound on how far from
+optimal it is.
+"""
+
+import heapq                # Heaps for Priority Queue
+
+from pancake import Budget, BudgetExceeded, Node, PriorityQueue, astar, flip
+from stats import TimedQueue
+
+
+"""
+WeightedQueue Class
+-------------------
+A PriorityQueue that orders nodes by g + w * h.
+"""
+class WeightedQueue(PriorityQueue):
+    def __init__(self, weight):
+        """
+        Args
+        ----
+        weight: float
+            The weight of the heuristic
+        """
+        super().__init__()
+        self.weight = weight
+
+
+    def priority(self, node):
+        """
+        Returns
+        -------
+        float
+            The weighted total cost of a node
+        """
+        return node.backward_cost + self.weight * node.forward_cost
+
+
+    def put(self, node):
+        """
+        Same as PriorityQueue.put, with the weighted total cost
+        """
+        heapq.heappush(self.heap, (self.priority(node), node.order_added, node))
+        self.index[node.state] = node.backward_cost
+        self.pushes += 1
+
+
+def check_weight(weight):
+    """
+    Raises a ValueError if a weight is below 1
+    """
+    if weight < 1:
+        raise ValueError("The weight must be at least 1")
+
+
+"""
+weighted Class
+--------------
+Weighted A*. The solution costs at most weight times the optimal cost.
+"""
+class weighted(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None, weight=2):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats:
+            See astar
+
+        weight: float
+            The weight of the heuristic, at least 1
+        """
+        check_weight(weight)
+        super().__init__(initial_state, heuristic, stats)
+        self.weight = weight
+        self.bound = weight
+        self.frontier = WeightedQueue(weight)
+        if self.stats.timed:
+            self.frontier = TimedQueue(self.frontier, self.stats)
+        self.frontier.put(self.root)
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The heuristic of the initial stack. Visited states are not
+            reopened, so the frontier does not give a better bound.
+        """
+        return self.root.forward_cost
+
+
+"""
+anytime Class
+-------------
+Anytime Repairing A* (ARA*). Every time a better solution is found,
+on_solution is called (if it is set) with the solution and its bound, so
+that a caller can use it while the search goes on.
+"""
+class anytime(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None, weight=2,
+                 weight_step=0.5, budget=None):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats:
+            See astar
+
+        weight: float
+            The weight of the first search, at least 1
+
+        weight_step: float
+            How much the weight goes down after each search
+
+        budget: Budget object
+            When to stop improving the solution. Default: no limit, so the
+            search ends with an optimal solution.
+        """
+        check_weight(weight)
+        if weight_step <= 0:
+            raise ValueError("The weight step must be positive")
+        super().__init__(initial_state, heuristic, stats)
+        self.weight = weight
+        self.weight_step = weight_step
+        self.budget = budget or Budget()
+        self.on_solution = None
+        self.bound = None
+
+
+    def explore(self):
+        """
+        Runs weighted A* with lower and lower weights, until the weight is
+        1 or the budget runs out
+        """
+        root = self.root
+        # The cheapest node found for each state
+        self.nodes = {root.state: root}
+        self.inconsistent = {}
+        self.incumbent = root if root.state == self.goal else None
+        self.solution = False
+        weight = self.weight
+        self.frontier = self.make_frontier(weight, [root])
+
+        while True:
+            finished = self.improve_path()
+            if self.incumbent is not None:
+                bound = min(weight, self.lower_bound_ratio())
+                if finished and weight == 1:
+                    bound = 1
+                if self.solution is not self.incumbent or bound != self.bound:
+                    self.solution = self.incumbent
+                    self.bound = bound
+                    if self.on_solution is not None:
+                        self.on_solution(self.solution, bound)
+            if not finished and self.incumbent is None:
+                raise BudgetExceeded
+            if not finished or weight == 1:
+                return
+
+            # Lower the weight, and put the inconsistent states back in the
+            # frontier
+            weight = max(1, weight - self.weight_step)
+            waiting = [self.nodes[state] for state in self.frontier.index]
+            waiting.extend(self.inconsistent.values())
+            self.inconsistent = {}
+            self.visited = set()
+            self.frontier = self.make_frontier(weight, waiting)
+
+
+    def make_frontier(self, weight, nodes):
+        """
+        Returns
+        -------
+        WeightedQueue object
+            A frontier with the given weight, which holds the given nodes
+        """
+        frontier = WeightedQueue(weight)
+        if self.stats.timed:
+            frontier = TimedQueue(frontier, self.stats)
+        for node in nodes:
+            frontier.put(node)
+        return frontier
+
+
+    def improve_path(self):
+        """
+        Expands nodes until no node in the frontier has a lower weighted
+        total cost than the incumbent.
+
+        Returns
+        -------
+        boolean
+            False if the budget ran out first
+        """
+        stats = self.stats
+        frontier = self.frontier
+        while not frontier.empty():
+            node = frontier.peek()
+            if (self.incumbent is not None and frontier.priority(node)
+                    >= self.incumbent.backward_cost):
+                return True
+            if self.budget.exceeded(stats, len(frontier.index)):
+                return False
+            frontier.get()
+            self.visited.add(node.state)
+            if node.state == self.goal:
+                continue
+            if self.on_expand is not None:
+                self.on_expand(node)
+            stats.expanded += 1
+            self.expand_node(node)
+            if len(frontier.index) > stats.peak_open:
+                stats.peak_open = len(frontier.index)
+        return True
+
+
+    def expand_node(self, node):
+        """
+        Adds the children of a node that are cheaper than the best node of
+        their state to the frontier (or to the inconsistent states, if the
+        state was visited in this search)
+        """
+        stats = self.stats
+        state = node.state
+        for flip_depth in range(2, self.length):
+            child_state = flip(state, flip_depth)
+            stats.generated += 1
+            best = self.nodes.get(child_state)
+            if best is not None and best.backward_cost <= node.backward_cost + flip_depth:
+                stats.duplicates += 1
+                continue
+
+            child = Node(child_state, node, self.order_added, flip_depth,
+                         self.heuristic.after_flip(state, node.forward_cost,
+                                                   flip_depth, child_state))
+            self.order_added += 1
+            self.nodes[child_state] = child
+            if child_state == self.goal:
+                self.incumbent = child
+            elif child_state in self.visited:
+                self.inconsistent[child_state] = child
+            else:
+                self.frontier.put(child)
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The lowest g + h of the states that may still lead to a
+            solution
+        """
+        states = list(self.frontier.index) + list(self.inconsistent)
+        if not states:
+            return self.root.forward_cost
+        return max(self.root.forward_cost,
+                   min(self.nodes[state].cost for state in states))
+
+
+    def lower_bound_ratio(self):
+        """
+        Returns
+        -------
+        float
+            The cost of the incumbent divided by a lower bound of the
+            optimal cost: the lowest g + h of the states that may still lead
+            to a cheaper solution
+        """
+        cost = self.incumbent.backward_cost
+        lower_bound = cost
+        for state in list(self.frontier.index) + list(self.inconsistent):
+            node = self.nodes[state]
+            if node.cost < lower_bound:
+                lower_bound = node.cost
+        if lower_bound == 0:
+            return 1
+        return cost / lower_bound
@@ -0,0 +1,396 @@
+"""
+Batch Solving
+-------------
+Solves many stacks of pancakes in one run instead of starting a new Python
+process for each stack. Stacks are read from a file (or from the standard
+input), one per line, as integers separated by spaces or commas. Empty
+lines and lines starting with # are skipped.
+
+The stacks are sent in chunks to a pool of worker processes, and one JSON
+object is written per stack as soon as its chunk is solved, so the output
+is not in the same order as the input. Each result has the line number and
+the stack, then either the flips of the solution, its cost, the number of
+nodes expanded and the time spent, or an error message. Stacks found in
+the solution cache (see solution_cache.py) are marked as cached, and
+stacks solved from a distance table (see distance_table.py) are marked as
+exact. With a budget, stacks whose search ran out of it are marked as
+exceeded, with the lower bound of their cost that the search reached.
+
+Each worker loads the heuristic (e.g. pattern databases) once and keeps it
+for every stack of the same size. Only a bounded number of chunks are
+waiting at any time, so the input can be as long as needed.
+"""
+
+import argparse             # For Parsing Arguments
+import concurrent.futures   # Process Pool
+import json                 # Output Format
+import os                   # Number of Cores
+import sys                  # Standard Input and Output
+import timeit               # Timing
+
+from heuristics import HEURISTICS, make_heuristic
+from pancake import ENGINES, QUEUES, Budget, check_stack
+from solution_cache import SolutionCache
+import solver
+
+# The settings of the worker process, set by start_worker()
+settings = {}
+# The heuristic of each size of stack, loaded once per worker
+heuristics = {}
+# The solution cache of the worker, if any
+caches = []
+# The distance table of each size of stack
+distances = {}
+
+
+def parse_stack(line):
+    """
+    Args
+    ----
+    line: string
+        Integers separated by spaces or commas
+
+    Returns
+    -------
+    list
+        The stack, or None if the line is empty or a comment
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    return [int(pancake) for pancake in line.replace(",", " ").split()]
+
+
+def read_stacks(lines):
+    """
+    Reads the stacks lazily from an iterable of lines.
+
+    Yields
+    ------
+    (int, list or string)
+        The line number and the stack, or an error message if the line is
+        not a list of integers
+    """
+    for number, line in enumerate(lines, 1):
+        try:
+            stack = parse_stack(line)
+        except ValueError:
+            yield number, "The stack should only contain integers."
+            continue
+        if stack is not None:
+            yield number, stack
+
+
+def start_worker(engine, heuristic, pdb_paths, table_size, cache_path,
+                 with_stats=False, queue="heap", distance_paths=(),
+                 limits=(), complete=False):
+    """
+    Runs once in every worker process to remember the settings, open the
+    solution cache and load the distance tables. limits are the arguments
+    of the Budget of every search (see pancake.Budget), and complete is
+    whether searches that run out of budget are completed greedily.
+    """
+    settings["engine"] = engine
+    settings["heuristic"] = heuristic
+    settings["pdb_paths"] = pdb_paths
+    settings["table_size"] = table_size
+    settings["with_stats"] = with_stats
+    settings["queue"] = queue
+    settings["limits"] = tuple(limits)
+    settings["complete"] = complete
+    if cache_path is not None:
+        caches.append(SolutionCache(cache_path))
+    if distance_paths:
+        from distance_table import DistanceTable
+        for path in distance_paths:
+            table = DistanceTable(path)
+            distances[table.size] = table
+
+
+def check_distance_tables(paths):
+    """
+    Checks that every file is a distance table that counts the pancakes
+    flipped, before the workers load them.
+
+    Raises
+    ------
+    ValueError
+        If a table cannot be used
+    """
+    if not paths:
+        return
+    from distance_table import DistanceTable
+    for path in paths:
+        try:
+            table = DistanceTable(path)
+        except OSError as error:
+            raise ValueError(str(error))
+        if table.unit:
+            raise ValueError(path + " counts flips instead of pancakes "
+                             "flipped")
+
+
+def solve(number, stack):
+    """
+    Solves one stack with the settings of the worker.
+
+    Args
+    ----
+    number: int
+        The line number of the stack
+
+    stack: list or string
+        The stack, or an error message from read_stacks()
+
+    Returns
+    -------
+    dict
+        The result that is written as JSON
+    """
+    if isinstance(stack, str):
+        return {"line": number, "error": stack}
+    result = {"line": number, "stack": stack}
+    error = check_stack(stack)
+    if error is not None:
+        result["error"] = error
+        return result
+
+    size = len(stack)
+    try:
+        if size not in heuristics:
+            heuristics[size] = make_heuristic(settings["heuristic"],
+                                              settings["pdb_paths"], size)
+        outcome = solver.solve(stack, engine=settings["engine"],
+                               heuristic=heuristics[size],
+                               distances=distances.get(size),
+                               cache=caches[0] if caches else None,
+                               budget=Budget(*settings["limits"]),
+                               complete=settings["complete"],
+                               table_size=settings["table_size"],
+                               queue=settings["queue"])
+    except (ValueError, OSError) as error:
+        result["error"] = str(error)
+        return result
+    result.update(outcome.as_dict(settings["with_stats"]))
+    return result
+
+
+def solve_chunk(chunk):
+    """
+    Solves a list of (line number, stack) pairs in a worker process.
+
+    Returns
+    -------
+    list
+        The result of each stack
+    """
+    return [solve(number, stack) for number, stack in chunk]
+
+
+def chunks(stacks, chunksize):
+    """
+    Groups the stacks into lists of at most chunksize stacks.
+    """
+    chunk = []
+    for item in stacks:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(lines, output, workers=None, chunksize=16, engine="astar",
+              heuristic="gap", pdb_paths=(), table_size=0, cache_path=None,
+              with_stats=False, queue="heap", distance_paths=(), limits=(),
+              complete=False):
+    """
+    Solves every stack of an iterable of lines and writes one JSON result
+    per line to output as soon as it is known.
+
+    Args
+    ----
+    lines: iterable
+        The input lines
+
+    output: file
+        Where the results are written
+
+    workers: int
+        The number of worker processes. Default: the number of cores
+
+    chunksize: int
+        The number of stacks sent to a worker at once
+
+    engine, heuristic, pdb_paths, table_size, queue:
+        The search settings (see pancake.py)
+
+    cache_path: string
+        The sqlite file of the solution cache shared by the workers (see
+        solution_cache.py), or None
+
+    with_stats: boolean
+        Whether every result includes all the counters of its search (see
+        stats.py)
+
+    distance_paths: list
+        The files of the distance tables (see distance_table.py). Stacks
+        of their sizes are solved from the tables without searching
+
+    limits, complete:
+        The limits of every search (the arguments of pancake.Budget), and
+        whether the stacks whose search runs out of budget are sorted
+        greedily
+
+    Returns
+    -------
+    int
+        The number of stacks that were read
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = set()
+    count = 0
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=start_worker,
+            initargs=(engine, heuristic, list(pdb_paths), table_size,
+                      cache_path, with_stats, queue,
+                      list(distance_paths), tuple(limits), complete)) as pool:
+        for chunk in chunks(read_stacks(lines), chunksize):
+            count += len(chunk)
+            pending.add(pool.submit(solve_chunk, chunk))
+
+            # Keep a few chunks per worker waiting, and write out results
+            # while the rest of the input is read
+            if len(pending) >= 2 * workers:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                write_results(done, output)
+
+        for future in concurrent.futures.as_completed(pending):
+            write_results([future], output)
+    return count
+
+
+def write_results(futures, output):
+    """
+    Writes the results of finished chunks as JSON lines.
+    """
+    for future in futures:
+        for result in future.result():
+            output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def main():
+    """
+    Parse through command line arguments, and solve every stack of the input
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve many stacks of pancakes, one per line, in parallel")
+    parser.add_argument(dest = "input",
+                        nargs = "?",
+                        default = "-",
+                        help = "The file with the stacks, or - for the "
+                               "standard input. Default: %(default)s")
+    parser.add_argument("-o", "--output",
+                        default = "-",
+                        help = "The file the JSON results are written to, or - "
+                               "for the standard output. Default: %(default)s")
+    parser.add_argument("-w", "--workers",
+                        type = int,
+                        default = None,
+                        help = "The number of worker processes. Default: the "
+                               "number of cores")
+    parser.add_argument("--chunksize",
+                        type = int,
+                        default = 16,
+                        help = "The number of stacks sent to a worker at once. "
+                               "Default: %(default)s")
+    parser.add_argument("--engine",
+                        choices = ENGINES,
+                        default = "astar",
+                        help = "The search algorithm. Default: %(default)s")
+    parser.add_argument("--queue",
+                        choices = list(QUEUES),
+                        default = "heap",
+                        help = "The priority queue of A* and the vector "
+                               "engine. Default: %(default)s")
+    parser.add_argument("--heuristic",
+                        choices = HEURISTICS,
+                        default = "gap",
+                        help = "The heuristic that guides the search. "
+                               "Default: %(default)s")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database built with "
+                               "pattern_database.py. Can be given several times")
+    parser.add_argument("--table-size",
+                        type = int,
+                        default = 0,
+                        help = "The size of the transposition table of IDA*. "
+                               "Default: %(default)s")
+    parser.add_argument("--cache",
+                        metavar = "FILE",
+                        help = "A sqlite file where solutions are stored, so "
+                               "that equivalent stacks are only searched once")
+    parser.add_argument("--distances",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A distance table built with distance_table.py. "
+                               "Can be given several times, for different "
+                               "sizes")
+    parser.add_argument("--stats",
+                        action = "store_true",
+                        help = "Add all the counters of the search to every result")
+    parser.add_argument("--deadline",
+                        type = float,
+                        metavar = "SECONDS",
+                        help = "How long the search of a stack may run")
+    parser.add_argument("--max-expansions",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of nodes the search of a stack may "
+                               "expand")
+    parser.add_argument("--max-frontier",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of states the frontier of a search "
+                               "may hold")
+    parser.add_argument("--max-memory",
+                        type = float,
+                        metavar = "MIB",
+                        help = "The memory a worker may use while it searches")
+    parser.add_argument("--complete",
+                        action = "store_true",
+                        help = "Sort the stacks whose search ran out of budget "
+                               "greedily, instead of giving an error")
+    args = parser.parse_args()
+    if args.chunksize < 1:
+        parser.error("The chunk size must be at least 1")
+    limits = (args.deadline, args.max_expansions, args.max_frontier,
+              args.max_memory)
+    try:
+        check_distance_tables(args.distances)
+        Budget(*limits)
+    except ValueError as error:
+        parser.error(str(error))
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    timer_start = timeit.default_timer()
+    with source, output:
+        count = run_batch(source, output, args.workers, args.chunksize,
+                          args.engine, args.heuristic, args.pdb,
+                          args.table_size, args.cache, args.stats, args.queue,
+                          args.distances, limits, args.complete)
+    timer_stop = timeit.default_timer()
+    print("Solved", count, "stacks in", round(timer_stop - timer_start, 2), "s",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
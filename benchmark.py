@@ -0,0 +1,403 @@
+"""
+Benchmark
+---------
+Measures the engines on the same stacks so that their performance can be
+compared, and so that changes that make them slower can be caught.
+
+For each size, a number of random stacks are generated from a seed (so
+every run uses the same stacks), and hard stacks are added in which no
+two neighbouring pancakes are of adjacent size, so that every position is
+a gap. Each engine solves every stack a number of times, and the fastest
+time of each stack is kept. For every run we record the wall time, the
+number of nodes expanded and generated and the largest size of the
+frontier. The peak memory (RSS) is measured by running each engine and
+size in a fresh process.
+
+Engines:
+* astar, ida, bidirectional, vector: the engines of pancake.py
+* ucs: A* with the zero heuristic, the uniform-cost search of
+  pancake_ucs.py
+
+The engines that have a priority queue (see QUEUE_ENGINES) can be run
+with several queues, e.g. the heap and the bucket queue. They are then
+reported as engine:queue (e.g. astar:bucket), except for the heap.
+
+Every optimal engine must find solutions of the same cost on the same
+stack, and an engine that may give up optimality (weighted A*) must find
+one that costs at most its bound times that cost. If not, the benchmark
+reports it and fails, so that a speedup never comes at the cost of
+correctness.
+
+The results can be written as CSV (one row per stack and engine) and as
+JSON (a summary per engine and size). A summary can be saved as a baseline
+and later runs compared against it: an engine and size whose time or
+number of expanded nodes grew by more than a threshold is reported as a
+regression and the benchmark fails.
+"""
+
+import argparse             # For Parsing Arguments
+import concurrent.futures   # Fresh Process per Measurement
+import csv                  # Output Format
+import importlib.util       # Checking for NumPy
+import json                 # Output and Baseline Format
+import multiprocessing      # Fresh Process per Measurement
+import random               # Random Stacks
+import resource             # Peak Memory
+import statistics           # Summaries
+import sys                  # Exit Code
+import timeit               # Timing
+
+from heuristics import HEURISTICS, ZeroHeuristic, make_heuristic
+from pancake import ENGINES, QUEUES, make_search
+from stats import SearchStats
+
+BENCHMARK_ENGINES = ENGINES + ["ucs"]
+# The engines measured by default: the vector engine needs NumPy, which is
+# optional
+DEFAULT_ENGINES = [engine for engine in BENCHMARK_ENGINES
+                   if engine != "vector"
+                   or importlib.util.find_spec("numpy") is not None]
+# The engines whose priority queue can be chosen
+QUEUE_ENGINES = ["astar", "vector", "ucs"]
+
+
+def random_stacks(size, count, seed):
+    """
+    Args
+    ----
+    size: int
+        The length of the stacks, including the plate
+
+    count: int
+        The number of stacks
+
+    seed: int
+        The seed of the random number generator. The same seed and size
+        always give the same stacks.
+
+    Returns
+    -------
+    list
+        The stacks, as tuples
+    """
+    generator = random.Random(seed * 1000 + size)
+    stacks = []
+    for _ in range(count):
+        pancakes = list(range(1, size))
+        generator.shuffle(pancakes)
+        stacks.append(tuple(pancakes) + (size,))
+    return stacks
+
+
+def hard_stacks(size):
+    """
+    Stacks in which no pancake is next to a pancake of adjacent size, nor
+    is the bottom pancake the largest one. The gap heuristic is as large as
+    it can be on these, and they are hard to sort.
+
+    Returns
+    -------
+    list
+        The stacks, as tuples (none if the size is too small to have any)
+    """
+    pancakes = list(range(1, size))
+    evens = pancakes[1::2]
+    odds = pancakes[0::2]
+    candidates = [evens + odds, odds[::-1] + evens[::-1],
+                  evens[::-1] + odds[::-1]]
+    stacks = []
+    for candidate in candidates:
+        stack = tuple(candidate) + (size,)
+        gaps = sum(1 for i in range(1, size)
+                   if abs(stack[i] - stack[i - 1]) != 1)
+        if gaps == size - 1 and stack not in stacks:
+            stacks.append(stack)
+    return stacks
+
+
+def measure(engine, size, stacks, repeat, heuristic, pdb_paths, queue="heap"):
+    """
+    Solves every stack with one engine. This runs in a fresh process, so
+    the peak memory of the process is the peak memory of the engine.
+
+    Args
+    ----
+    engine: string
+        The name of the engine (see BENCHMARK_ENGINES)
+
+    size: int
+        The length of the stacks
+
+    stacks: list
+        The stacks to solve
+
+    repeat: int
+        The number of times each stack is solved. The fastest time is kept.
+
+    heuristic, pdb_paths:
+        The heuristic of the engines of pancake.py
+
+    queue: string
+        The priority queue of the engine (see pancake.QUEUES)
+
+    Returns
+    -------
+    rows: list
+        One dictionary per stack
+
+    peak_rss: int
+        The peak memory of the process, in kilobytes
+    """
+    if engine == "ucs":
+        search_engine, search_heuristic = "astar", ZeroHeuristic()
+    else:
+        search_engine = engine
+        search_heuristic = make_heuristic(heuristic, pdb_paths, size)
+    rows = []
+    for stack in stacks:
+        times = []
+        for _ in range(repeat):
+            stats = SearchStats()
+            timer_start = timeit.default_timer()
+            search = make_search(search_engine, stack, search_heuristic,
+                                 stats=stats, queue=queue)
+            search.run()
+            solution = search.solution
+            times.append(timeit.default_timer() - timer_start)
+        rows.append({
+            "engine": engine if queue == "heap" else engine + ":" + queue,
+            "size": size,
+            "stack": " ".join(str(pancake) for pancake in stack),
+            "cost": solution.backward_cost if solution else None,
+            "bound": search.bound,
+            "time": min(times),
+            "expanded": stats.expanded,
+            "generated": stats.generated,
+            "peak_frontier": stats.peak_open,
+        })
+    return rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_benchmark(engines, sizes, count, seed, repeat, heuristic="gap",
+                  pdb_paths=(), queues=("heap",)):
+    """
+    Runs every engine on the stacks of every size, with every queue for the
+    engines that have one.
+
+    Returns
+    -------
+    rows: list
+        One dictionary per stack and engine
+
+    summary: dict
+        For each "engine/size", the total time, expanded and generated
+        nodes over all stacks, the largest frontier and the peak memory
+    """
+    rows = []
+    summary = {}
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        stacks = random_stacks(size, count, seed) + hard_stacks(size)
+        for engine in engines:
+            for queue in (queues if engine in QUEUE_ENGINES else ["heap"]):
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=1, mp_context=context) as pool:
+                    engine_rows, peak_rss = pool.submit(
+                        measure, engine, size, stacks, repeat, heuristic,
+                        list(pdb_paths), queue).result()
+                rows.extend(engine_rows)
+                key = engine_rows[0]["engine"] + "/" + str(size)
+                summary[key] = summarize(engine_rows, peak_rss)
+                print("Size", size, engine_rows[0]["engine"], "took",
+                      round(summary[key]["time"], 3), "s", file=sys.stderr)
+    return rows, summary
+
+
+def summarize(rows, peak_rss):
+    """
+    Returns
+    -------
+    dict
+        The totals of the rows of one engine and size
+    """
+    return {
+        "stacks": len(rows),
+        "time": sum(row["time"] for row in rows),
+        "median_time": statistics.median(row["time"] for row in rows),
+        "expanded": sum(row["expanded"] for row in rows),
+        "generated": sum(row["generated"] for row in rows),
+        "peak_frontier": max(row["peak_frontier"] for row in rows),
+        "peak_rss_kb": peak_rss,
+    }
+
+
+def check_costs(rows):
+    """
+    Returns
+    -------
+    list
+        A message for every stack on which the optimal engines found
+        solutions of different costs, or on which an engine with a bound
+        found a solution that costs more than its bound times the optimal
+        cost
+    """
+    costs = {}
+    bounds = {}
+    for row in rows:
+        costs.setdefault((row["size"], row["stack"]), {})[row["engine"]] = row["cost"]
+        bounds[row["engine"]] = row["bound"]
+    mismatches = []
+    for (size, stack), by_engine in sorted(costs.items()):
+        optimal = set(cost for engine, cost in by_engine.items()
+                      if bounds[engine] == 1)
+        if len(optimal) > 1:
+            mismatches.append("Different costs for " + stack + ": "
+                              + json.dumps(by_engine))
+        elif optimal:
+            cost = optimal.pop()
+            for engine, engine_cost in by_engine.items():
+                if (bounds[engine] != 1 and (engine_cost is None or cost is None
+                        or engine_cost > bounds[engine] * cost)):
+                    mismatches.append("The cost of " + engine + " for " + stack
+                                      + " is more than " + str(bounds[engine])
+                                      + " times the optimal cost: "
+                                      + json.dumps(by_engine))
+    return mismatches
+
+
+def compare(summary, baseline, threshold):
+    """
+    Args
+    ----
+    summary: dict
+        The summary of this run
+
+    baseline: dict
+        A summary saved by an earlier run
+
+    threshold: float
+        The relative increase that counts as a regression (e.g. 0.2 for
+        20%)
+
+    Returns
+    -------
+    list
+        A message for every regression
+    """
+    regressions = []
+    for key, result in sorted(summary.items()):
+        if key not in baseline:
+            continue
+        for measure_name in ["time", "expanded"]:
+            old = baseline[key].get(measure_name)
+            new = result.get(measure_name)
+            if old is None or new is None or old == 0:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(key + " " + measure_name + " went from "
+                                   + str(round(old, 4)) + " to "
+                                   + str(round(new, 4)))
+    return regressions
+
+
+def main():
+    """
+    Parse through command line arguments, and run the benchmark
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare the engines on the same random and hard stacks")
+    parser.add_argument("--engines",
+                        nargs = "+",
+                        choices = BENCHMARK_ENGINES,
+                        default = DEFAULT_ENGINES,
+                        help = "The engines to measure. Default: all of them "
+                               "(but vector if NumPy is not installed)")
+    parser.add_argument("--sizes",
+                        nargs = "+",
+                        type = int,
+                        default = [5, 6, 7, 8, 9],
+                        help = "The lengths of the stacks, including the "
+                               "plate. Default: %(default)s")
+    parser.add_argument("--count",
+                        type = int,
+                        default = 10,
+                        help = "The number of random stacks per size. "
+                               "Default: %(default)s")
+    parser.add_argument("--seed",
+                        type = int,
+                        default = 0,
+                        help = "The seed of the random stacks. Default: %(default)s")
+    parser.add_argument("--repeat",
+                        type = int,
+                        default = 3,
+                        help = "The number of times each stack is solved. "
+                               "Default: %(default)s")
+    parser.add_argument("--heuristic",
+                        choices = HEURISTICS,
+                        default = "gap",
+                        help = "The heuristic of the engines of pancake.py. "
+                               "Default: %(default)s")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database. Can be given several times")
+    parser.add_argument("--queues",
+                        nargs = "+",
+                        choices = list(QUEUES),
+                        default = ["heap"],
+                        help = "The priority queues of the engines that have "
+                               "one. Default: %(default)s")
+    parser.add_argument("--csv",
+                        metavar = "FILE",
+                        help = "Write one row per stack and engine to a CSV file")
+    parser.add_argument("--json",
+                        metavar = "FILE",
+                        help = "Write the summary per engine and size to a JSON file")
+    parser.add_argument("--baseline",
+                        metavar = "FILE",
+                        help = "Compare the summary with a baseline saved earlier")
+    parser.add_argument("--save-baseline",
+                        metavar = "FILE",
+                        help = "Save the summary as a baseline")
+    parser.add_argument("--threshold",
+                        type = float,
+                        default = 0.2,
+                        help = "The relative increase in time or expanded nodes "
+                               "that counts as a regression. Default: %(default)s")
+    args = parser.parse_args()
+
+    rows, summary = run_benchmark(args.engines, args.sizes, args.count,
+                                  args.seed, args.repeat, args.heuristic,
+                                  args.pdb, args.queues)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    print(json.dumps(summary, indent=2))
+
+    failed = False
+    for mismatch in check_costs(rows):
+        print("Error:", mismatch)
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for regression in compare(summary, baseline, args.threshold):
+            print("Regression:", regression)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
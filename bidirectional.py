@@ -0,0 +1,292 @@
+"""
+Bidirectional Search
+--------------------
+The goal of every search is known in advance: the sorted stack. Because a
+flip is its own inverse (and costs the same in both directions), we can
+search forwards from the initial stack and backwards from the sorted stack
+at the same time, and stop when the two searches meet in the middle.
+
+The two searches are interleaved with the MM algorithm ("Bidirectional
+Search That Is Guaranteed to Meet in the Middle", Holte et al.). Each
+direction orders its frontier by max(f, 2g), where f is the total cost and
+g the backward cost of a node, and always expands the direction whose best
+node has the lowest priority. Whenever a state is reached by both
+searches, the cost of the path through it is a candidate solution. The
+search stops when the best candidate is no more than a lower bound on the
+cost of any path that has not been found yet: the lowest priority in
+either frontier, the lowest total cost in either frontier, or the sum of
+the lowest backward costs in the two frontiers plus the cheapest flip
+(2 pancakes).
+
+The forward search uses the heuristic of the search, and the backward
+search uses the gap heuristic towards the initial stack. With the zero
+heuristic, both directions run a uniform-cost search.
+"""
+
+import heapq                # Heaps for Priority Queue
+import logging              # For Debugging Functions
+
+from heuristics import RelativeGapHeuristic, ZeroHeuristic
+from pancake import BudgetExceeded, Node, astar, flip, replay
+from stats import TimedHeuristic
+
+# The cheapest possible flip
+CHEAPEST_FLIP = 2
+
+
+"""
+Frontier Class
+--------------
+The frontier and the visited states of one direction of the search. The
+frontier is ordered three ways (by priority, by total cost and by backward
+cost), each with its own heap, because all three minimums are needed for
+the stopping rule. A node is in the frontier as long as open maps its
+state to that node; nodes that are no longer in open are stale and are
+skipped when they reach the top of a heap.
+"""
+class Frontier():
+    def __init__(self, root):
+        """
+        Args
+        ----
+        root: Node object
+            The node this direction starts from
+        """
+        self.open = {}
+        self.closed = {}
+        self.by_priority = []
+        self.by_total_cost = []
+        self.by_backward_cost = []
+        # Counts the pushes and pops of the priority heap, and the states
+        # taken back out of the visited states
+        self.pushes = 0
+        self.pops = 0
+        self.reopened = 0
+        self.put(root)
+
+
+    def put(self, node):
+        """
+        Adds a node to the frontier, replacing any other node with the same
+        state.
+        """
+        if self.closed.pop(node.state, None) is not None:
+            self.reopened += 1
+        self.open[node.state] = node
+        self.pushes += 1
+        priority = max(node.cost, 2 * node.backward_cost)
+        heapq.heappush(self.by_priority, (priority, node.order_added, node))
+        heapq.heappush(self.by_total_cost, (node.cost, node.order_added, node))
+        heapq.heappush(self.by_backward_cost,
+                       (node.backward_cost, node.order_added, node))
+
+
+    def top(self, heap):
+        """
+        Removes the stale nodes from the top of a heap.
+
+        Returns
+        -------
+        The smallest key in the heap
+        """
+        while heap[0][2] is not self.open.get(heap[0][2].state):
+            heapq.heappop(heap)
+            if heap is self.by_priority:
+                self.pops += 1
+        return heap[0][0]
+
+
+    def get(self):
+        """
+        Moves the node with the lowest priority from the frontier to the
+        visited states.
+
+        Returns
+        -------
+        Node object
+        """
+        self.top(self.by_priority)
+        node = heapq.heappop(self.by_priority)[2]
+        self.pops += 1
+        del self.open[node.state]
+        self.closed[node.state] = node
+        return node
+
+
+    def find(self, state):
+        """
+        Returns
+        -------
+        The node of a state that was reached by this direction, or None
+        """
+        node = self.open.get(state)
+        if node is None:
+            node = self.closed.get(state)
+        return node
+
+
+    def empty(self):
+        return len(self.open) == 0
+
+
+"""
+bidirectional Class
+-------------------
+Runs the MM bidirectional search. The two halves of the best path are
+joined into a chain of nodes, so print_solution() works as for A*.
+"""
+class bidirectional(astar):
+    def collect_stats(self):
+        """
+        Adds up the counters kept by the frontiers of both directions
+        """
+        stats = self.stats
+        stats.pushes = sum(frontier.pushes for frontier in self.frontiers)
+        stats.pops = sum(frontier.pops for frontier in self.frontiers)
+        stats.reopened = sum(frontier.reopened for frontier in self.frontiers)
+        stats.peak_closed = sum(len(frontier.closed)
+                                for frontier in self.frontiers)
+
+
+    def explore(self):
+        """
+        Runs the bidirectional search
+        """
+        heuristic = self.heuristic
+        if isinstance(heuristic, TimedHeuristic):
+            heuristic = heuristic.heuristic
+        if isinstance(heuristic, ZeroHeuristic):
+            backward_heuristic = ZeroHeuristic()
+        else:
+            backward_heuristic = RelativeGapHeuristic(self.root.state)
+        if self.stats.timed:
+            backward_heuristic = TimedHeuristic(backward_heuristic, self.stats)
+        goal = Node(self.goal, None, self.order_added, None,
+                    backward_heuristic(self.goal))
+        self.order_added += 1
+        self.heuristics = [self.heuristic, backward_heuristic]
+        self.frontiers = [Frontier(self.root), Frontier(goal)]
+        # The lower bound of the optimal cost at the last expansion
+        self.cost_bound = self.root.forward_cost
+
+        # The cheapest path found so far, and the nodes where the two
+        # searches met on it
+        self.best_cost = None
+        self.meeting = None
+        if self.root.state == self.goal:
+            self.best_cost = 0
+            self.meeting = (self.root, goal)
+
+        forward, backward = self.frontiers
+        while not forward.empty() and not backward.empty():
+            priorities = [forward.top(forward.by_priority),
+                          backward.top(backward.by_priority)]
+            lower_bound = max(min(priorities),
+                              forward.top(forward.by_total_cost),
+                              backward.top(backward.by_total_cost),
+                              forward.top(forward.by_backward_cost)
+                              + backward.top(backward.by_backward_cost)
+                              + CHEAPEST_FLIP)
+            self.cost_bound = lower_bound
+            if self.best_cost is not None and self.best_cost <= lower_bound:
+                break
+            if self.budget is not None and self.budget.exceeded(
+                    self.stats, len(forward.open) + len(backward.open)):
+                raise BudgetExceeded
+
+            # Expand the direction with the lowest priority
+            direction = 0 if priorities[0] <= priorities[1] else 1
+            self.expand(direction)
+
+        if self.best_cost is None:
+            self.solution = False
+        else:
+            self.solution = replay(self.root, self.meeting_flips(), self.heuristic)
+
+
+    def expand(self, direction):
+        """
+        Expands the node with the lowest priority in one direction, and
+        checks whether its children meet the other direction.
+
+        Args
+        ----
+        direction: int
+            0 for the forward search, 1 for the backward search
+        """
+        frontier = self.frontiers[direction]
+        other = self.frontiers[1 - direction]
+        heuristic = self.heuristics[direction]
+        curr_node = frontier.get()
+        stats = self.stats
+        stats.expanded += 1
+        if self.on_expand is not None:
+            self.on_expand(curr_node)
+        if self.debug:
+            logging.debug("Expanding %s in direction %d", curr_node.state,
+                          direction)
+
+        for flip_depth in range(2, self.length):
+            state = flip(curr_node.state, flip_depth)
+            backward_cost = curr_node.backward_cost + flip_depth
+
+            # Skip states that this direction already reached as cheaply
+            stats.generated += 1
+            known = frontier.find(state)
+            if known is not None and known.backward_cost <= backward_cost:
+                stats.duplicates += 1
+                continue
+
+            child = Node(state, curr_node, self.order_added, flip_depth,
+                         heuristic.after_flip(curr_node.state,
+                                              curr_node.forward_cost,
+                                              flip_depth, state))
+            self.order_added += 1
+            frontier.put(child)
+            if len(frontier.open) + len(other.open) > stats.peak_open:
+                stats.peak_open = len(frontier.open) + len(other.open)
+
+            # If the other direction reached this state too, we have a path
+            meeting = other.find(state)
+            if meeting is not None:
+                cost = backward_cost + meeting.backward_cost
+                if self.best_cost is None or cost < self.best_cost:
+                    self.best_cost = cost
+                    if direction == 0:
+                        self.meeting = (child, meeting)
+                    else:
+                        self.meeting = (meeting, child)
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The lower bound of the optimal cost that the search would stop
+            at, at the last expansion
+        """
+        return self.cost_bound
+
+
+    def meeting_flips(self):
+        """
+        Returns
+        -------
+        list
+            The flips of the best path, from the initial stack to the
+            sorted stack
+        """
+        forward_node, backward_node = self.meeting
+        flip_depths = []
+        while forward_node.parent is not None:
+            flip_depths.append(forward_node.flip_depth)
+            forward_node = forward_node.parent
+        flip_depths.reverse()
+
+        # A flip is its own inverse, so the flip that reached a node of the
+        # backward search also leads back to its parent
+        while backward_node.parent is not None:
+            flip_depths.append(backward_node.flip_depth)
+            backward_node = backward_node.parent
+        return flip_depths
@@ -0,0 +1,247 @@
+"""
+Breadth-First Search for Unit Costs
+-----------------------------------
+In the classic pancake problem, every flip costs 1 no matter how many
+pancakes are flipped, and the cost of a stack is its number of flips. All
+the edges cost the same, so a breadth-first search, one layer of stacks
+per number of flips, finds an optimal solution without a priority queue.
+
+Stacks are ranked to integers as permutations (with the rank() of
+pattern_database.py, every pancake being tracked), so a layer is a
+compact array of ranks, and the visited stacks are a bytearray indexed by
+rank that holds the flip that reached each stack (0 if it has not been
+reached). A flip is its own inverse, so the flips of the solution are
+found by undoing the stored flips from the sorted stack back to the
+initial stack; no nodes are kept.
+
+With bidirectional, a second search starts from the sorted stack, and the
+smaller of the two frontiers is expanded each time. The searches meet when
+a stack is reached by both; the layer that found it is finished, and the
+shortest of the paths through the stacks where they met is the solution.
+"""
+
+import array                # Layers of Ranks
+import math                 # Number of Permutations
+
+from pancake import BudgetExceeded, astar, flip, replay
+from pattern_database import rank, unrank
+
+# The largest number of stacks for which the visited stacks are kept in a
+# bytearray; larger stacks keep them in a dictionary
+DENSE_LIMIT = 1 << 28
+# The flip stored for the stack a search starts from (flips are at least 2)
+START = 1
+
+
+"""
+SparseFlips Class
+-----------------
+The flip that reached each visited stack, for stacks that have too many
+permutations for a bytearray. It is indexed like the bytearray, and gives
+0 for stacks that have not been reached.
+"""
+class SparseFlips():
+    def __init__(self):
+        """
+        Creates an empty table
+        """
+        self.flips = {}
+
+
+    def __getitem__(self, index):
+        return self.flips.get(index, 0)
+
+
+    def __setitem__(self, index, flip_depth):
+        self.flips[index] = flip_depth
+
+
+    def __len__(self):
+        return len(self.flips)
+
+
+"""
+breadth_first Class
+-------------------
+A breadth-first search where every flip costs 1, from the initial stack
+(and from the sorted stack, if bidirectional).
+"""
+class breadth_first(astar):
+    def __init__(self, initial_state, stats=None, bidirectional=False):
+        """
+        Args
+        ----
+        initial_state, stats:
+            See astar
+
+        bidirectional: boolean
+            Whether a second search starts from the sorted stack
+        """
+        super().__init__(initial_state, None, stats)
+        self.bidirectional = bidirectional
+        self.positions = self.length - 1
+        self.offset = min(initial_state)
+        self.permutations = math.factorial(self.positions)
+        # The number of flips to the last layer of each search
+        self.depths = [0, 0]
+
+
+    def collect_stats(self):
+        """
+        The counters were kept by explore()
+        """
+
+
+    def rank(self, state):
+        """
+        Returns
+        -------
+        int
+            The rank of a stack, without its plate
+        """
+        offset = self.offset
+        return rank([pancake - offset for pancake in state[:-1]],
+                    self.positions)
+
+
+    def make_flips(self):
+        """
+        Returns
+        -------
+        bytearray or SparseFlips object
+            An empty table of the flips that reached the visited stacks
+        """
+        if self.permutations <= DENSE_LIMIT:
+            return bytearray(self.permutations)
+        return SparseFlips()
+
+
+    def explore(self):
+        """
+        Runs the search, one layer at a time, and rebuilds the solution
+        """
+        stats = self.stats
+        start = self.rank(self.root.state)
+        goal = self.rank(self.goal)
+        forward = self.make_flips()
+        forward[start] = START
+        layers = [array.array("Q", [start])]
+        tables = [forward]
+        if self.bidirectional:
+            backward = self.make_flips()
+            backward[goal] = START
+            layers.append(array.array("Q", [goal]))
+            tables.append(backward)
+
+        meetings = [goal] if start == goal else []
+        target = None if self.bidirectional else goal
+        other = None
+        while not meetings:
+            # Expand the smaller frontier
+            side = 0
+            if self.bidirectional:
+                if len(layers[1]) < len(layers[0]):
+                    side = 1
+                other = tables[1 - side]
+            if len(layers[side]) == 0:
+                self.solution = False
+                return
+            layers[side] = self.expand_layer(layers[side], tables[side],
+                                             other, target, meetings)
+            self.depths[side] += 1
+            if len(layers[side]) > stats.peak_open:
+                stats.peak_open = len(layers[side])
+        stats.peak_closed = sum(len(table) if not isinstance(table, bytearray)
+                                else self.permutations - table.count(0)
+                                for table in tables)
+
+        best = None
+        for meeting in meetings:
+            flips = self.flips_to(meeting, forward)
+            flips.reverse()
+            if self.bidirectional:
+                flips.extend(self.flips_to(meeting, backward))
+            if best is None or len(flips) < len(best):
+                best = flips
+        self.solution = replay(self.root, best, self.heuristic)
+
+
+    def expand_layer(self, layer, table, other, target, meetings):
+        """
+        Expands every stack of a layer.
+
+        Args
+        ----
+        layer: array
+            The ranks of the stacks to expand
+
+        table: bytearray or SparseFlips object
+            The flips that reached the stacks visited by this search
+
+        other: bytearray or SparseFlips object
+            The visited stacks of the other search, or None
+
+        target: int
+            The rank of the goal, if there is no other search
+
+        meetings: list
+            Where the ranks of the stacks reached by both searches (or of
+            the goal) are added
+
+        Returns
+        -------
+        array
+            The ranks of the next layer
+        """
+        stats = self.stats
+        budget = self.budget
+        positions = self.positions
+        next_layer = array.array("Q")
+        for index in layer:
+            if budget is not None and budget.exceeded(stats, len(next_layer)):
+                raise BudgetExceeded
+            state = unrank(index, positions, positions)
+            stats.expanded += 1
+            for flip_depth in range(2, self.length):
+                child = rank(flip(state, flip_depth), positions)
+                stats.generated += 1
+                if table[child]:
+                    stats.duplicates += 1
+                    continue
+                table[child] = flip_depth
+                next_layer.append(child)
+                if child == target or (other is not None and other[child]):
+                    meetings.append(child)
+        return next_layer
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The number of flips that every solution needs at least: the
+            searches have not met in the layers they reached, so a solution
+            has a flip more than the two searches together
+        """
+        return sum(self.depths) + 1
+
+
+    def flips_to(self, index, table):
+        """
+        Undoes the stored flips from a stack back to the stack the search
+        started from.
+
+        Returns
+        -------
+        list
+            The flips, in the order they were undone
+        """
+        flips = []
+        state = unrank(index, self.positions, self.positions)
+        flip_depth = table[index]
+        while flip_depth != START:
+            flips.append(flip_depth)
+            state = flip(state, flip_depth)
+            flip_depth = table[rank(state, self.positions)]
+        return flips
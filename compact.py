@@ -0,0 +1,160 @@
+"""
+Node-Free Search
+----------------
+Runs A* without Node objects, so that many more states fit in memory. A
+state is packed into a single integer: its pancakes (shifted so that the
+smallest is 1) read as the bytes of a big-endian number. The only table
+maps the key of every state that has been reached to its backward cost g
+and the flip that reached it, packed into one integer as well. The
+frontier is a heap of integers that pack the total cost, g and the key,
+so that comparing two entries is comparing two numbers.
+
+Since the heuristics are consistent, a state is never reached more
+cheaply after it has been expanded, so no visited set is needed: a heap
+entry is stale (and skipped) when its g is no longer the g in the table.
+A flip is its own inverse, so the solution is rebuilt backwards from the
+sorted stack by undoing the flip stored for each state.
+
+A Node with its tuple state, its heap entry and the index of the frontier
+takes several hundred bytes per state; here a state costs one dictionary
+slot, two integers and one heap integer.
+"""
+
+import heapq                # Heaps for Priority Queue
+
+from pancake import BudgetExceeded, astar, flip, replay
+
+# The number of bits of the backward cost in a heap entry
+COST_BITS = 20
+COST_MASK = (1 << COST_BITS) - 1
+
+
+"""
+compact Class
+-------------
+A* with integer keys instead of nodes. Ties between nodes of the same
+total cost go to the node with the largest backward cost.
+"""
+class compact(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats:
+            See astar
+        """
+        if len(initial_state) > 255:
+            raise ValueError("The compact engine sorts at most 255 pancakes")
+        super().__init__(initial_state, heuristic, stats)
+        # Shifts the pancakes so that they fit in bytes
+        self.offset = min(initial_state) - 1
+        self.key_bits = 8 * self.length
+        self.key_mask = (1 << self.key_bits) - 1
+
+
+    def collect_stats(self):
+        """
+        The counters were kept by explore()
+        """
+
+
+    def pack(self, state):
+        """
+        Returns
+        -------
+        bytes
+            A state as bytes
+        """
+        offset = self.offset
+        return bytes([pancake - offset for pancake in state])
+
+
+    def explore(self):
+        """
+        Runs the A* search, and rebuilds the solution from the table
+        """
+        stats = self.stats
+        length = self.length
+        heuristic = self.heuristic
+        key_bits = self.key_bits
+        key_mask = self.key_mask
+        entry_shift = key_bits + COST_BITS
+        budget = self.budget
+
+        start = self.pack(self.root.state)
+        goal = self.pack(self.goal)
+        start_key = int.from_bytes(start, "big")
+        # Maps the key of each state to (g << 8) | the flip that reached it
+        table = {start_key: 0}
+        heap = [(self.root.forward_cost << entry_shift) | (COST_MASK << key_bits) | start_key]
+        self.heap = heap
+
+        while heap:
+            if budget is not None and budget.exceeded(stats, len(heap)):
+                stats.peak_closed = len(table)
+                raise BudgetExceeded
+            entry = heapq.heappop(heap)
+            stats.pops += 1
+            key = entry & key_mask
+            backward_cost = COST_MASK - ((entry >> key_bits) & COST_MASK)
+            if table[key] >> 8 != backward_cost:
+                continue
+            state = key.to_bytes(length, "big")
+            if state == goal:
+                self.solution_from(state, table)
+                stats.peak_closed = len(table)
+                return
+
+            stats.expanded += 1
+            forward_cost = (entry >> entry_shift) - backward_cost
+            for flip_depth in range(2, length):
+                child = state[flip_depth - 1::-1] + state[flip_depth:]
+                child_key = int.from_bytes(child, "big")
+                child_cost = backward_cost + flip_depth
+                best = table.get(child_key)
+                if best is not None and best >> 8 <= child_cost:
+                    stats.duplicates += 1
+                    continue
+                table[child_key] = (child_cost << 8) | flip_depth
+                child_forward_cost = heuristic.after_flip(
+                    state, forward_cost, flip_depth, child)
+                heapq.heappush(heap,
+                               ((child_cost + child_forward_cost) << entry_shift)
+                               | ((COST_MASK - child_cost) << key_bits)
+                               | child_key)
+                stats.pushes += 1
+            stats.generated += length - 2
+            if len(heap) > stats.peak_open:
+                stats.peak_open = len(heap)
+
+        self.solution = False
+        stats.peak_closed = len(table)
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The least total cost in the heap (stale entries cost more than
+            the entry that replaced them, so they do not lower it)
+        """
+        if not self.heap:
+            return self.root.forward_cost
+        return max(self.root.forward_cost,
+                   self.heap[0] >> (self.key_bits + COST_BITS))
+
+
+    def solution_from(self, state, table):
+        """
+        Undoes the stored flips from the sorted stack back to the initial
+        stack, and replays them so that the solution can be printed
+        """
+        flips = []
+        flip_depth = table[int.from_bytes(state, "big")] & 0xFF
+        while flip_depth != 0:
+            flips.append(flip_depth)
+            state = flip(state, flip_depth)
+            flip_depth = table[int.from_bytes(state, "big")] & 0xFF
+        flips.reverse()
+        self.solution = replay(self.root, flips, self.heuristic)
@@ -0,0 +1,321 @@
+"""
+Distance Tables
+---------------
+For small stacks, the cost of sorting every stack fits in memory. A
+distance table holds the optimal cost of every stack of a given size, and
+the first flip of an optimal solution, so a stack is solved by following
+the flips in the table instead of searching: each step is one lookup.
+
+The table is computed once, offline, by a search backwards from the sorted
+stack over every permutation of the pancakes (a flip is its own inverse,
+so searching backwards is the same as searching forwards). The costs are
+small integers, so the search is a Dijkstra search with one bucket per
+cost (a breadth-first search when every flip costs 1).
+
+There are two cost models: by default a flip costs the number of pancakes
+flipped, as in pancake.py. With unit costs, every flip costs 1, and the
+cost of a stack is its number of flips (the classic pancake number).
+
+Pancakes are numbered as in pattern_database.py. A stack is stored as the
+position of each pancake, ranked as a permutation (its Lehmer code) with
+the rank() of pattern_database.py, where every pancake is tracked. The
+table therefore has (size - 1)! entries and no holes: about 3.6 million
+for a stack of 10 pancakes and a plate.
+
+File Format
+-----------
+The file starts with a header: the magic bytes b"DST1", the size of the
+stack and the cost model (0 for the number of pancakes flipped, 1 for unit
+costs). Then comes the table of costs, one unsigned 16-bit integer per
+stack, followed by the table of moves, one byte per stack: the first flip
+of an optimal solution (0 for the sorted stack). The file is loaded with
+mmap, so the tables are shared between processes and only the pages that
+are used are read from disk.
+
+Since the table holds the exact cost of every stack, it is also used to
+check that a heuristic never overestimates and is consistent (see
+check_heuristic()).
+"""
+
+import argparse             # For Parsing Arguments
+import array                # Compact Tables
+import math                 # Size of the Tables
+import mmap                 # Memory-mapped Tables
+import struct               # Binary File Header
+import timeit               # Timing
+
+from heuristics import HEURISTICS, make_heuristic
+from pattern_database import UNKNOWN, rank, unrank
+
+MAGIC = b"DST1"
+HEADER = struct.Struct("<4sHH")
+
+
+def build(size, unit=False):
+    """
+    Computes the optimal cost and the first flip of every stack with a
+    search from the sorted stack.
+
+    Args
+    ----
+    size: int
+        The length of the stack, including the plate
+
+    unit: boolean
+        True if every flip costs 1, False if a flip costs the number of
+        pancakes flipped
+
+    Returns
+    -------
+    (array, array)
+        The cost and the first flip of each stack, indexed by rank()
+    """
+    positions = size - 1
+    entries = math.factorial(positions)
+    costs = array.array("H", [UNKNOWN]) * entries
+    moves = array.array("B", [0]) * entries
+
+    # In the sorted stack, pancake p is at position p - 1
+    goal = rank(list(range(positions)), positions)
+    costs[goal] = 0
+    # buckets[c] holds the stacks that were reached with cost c
+    buckets = [[goal]]
+    cost = 0
+    while cost < len(buckets):
+        for index in buckets[cost]:
+            if costs[index] != cost:
+                continue
+            places = unrank(index, positions, positions)
+            for flip_depth in range(2, size):
+                # Flipping the top flip_depth pancakes moves the pancake at
+                # position p to position flip_depth - 1 - p
+                child = rank([flip_depth - 1 - place if place < flip_depth
+                              else place for place in places], positions)
+                child_cost = cost + (1 if unit else flip_depth)
+                if child_cost < costs[child]:
+                    costs[child] = child_cost
+                    # The same flip leads back from the child
+                    moves[child] = flip_depth
+                    while len(buckets) <= child_cost:
+                        buckets.append([])
+                    buckets[child_cost].append(child)
+        buckets[cost] = None
+        cost += 1
+    return costs, moves
+
+
+def check_heuristic(heuristic, size, costs, unit=False):
+    """
+    Compares a heuristic with the optimal cost of every stack of a size.
+
+    Args
+    ----
+    heuristic: heuristic object
+        The heuristic to check (see heuristics.py)
+
+    size: int
+        The length of the stack, including the plate
+
+    costs: array
+        The optimal cost of each stack, from build()
+
+    unit: boolean
+        True if the costs count flips instead of pancakes flipped
+
+    Returns
+    -------
+    (int, int, float)
+        The number of stacks whose heuristic is above their cost, the
+        number of flips after which the heuristic drops by more than the
+        cost of the flip, and the sum of the heuristics divided by the sum
+        of the costs
+    """
+    positions = size - 1
+    overestimates = 0
+    inconsistencies = 0
+    total_heuristic = 0
+    total_cost = 0
+    for index, cost in enumerate(costs):
+        state = [0] * positions
+        for pancake, place in enumerate(unrank(index, positions, positions)):
+            state[place] = pancake + 1
+        state = tuple(state) + (size,)
+        h = heuristic(state)
+        if h > cost:
+            overestimates += 1
+        for flip_depth in range(2, size):
+            flipped = state[flip_depth - 1::-1] + state[flip_depth:]
+            child_h = heuristic.after_flip(state, h, flip_depth, flipped)
+            if h > (1 if unit else flip_depth) + child_h:
+                inconsistencies += 1
+        total_heuristic += h
+        total_cost += cost
+    return overestimates, inconsistencies, total_heuristic / max(1, total_cost)
+
+
+def save(path, size, unit, costs, moves):
+    """
+    Writes a distance table to a file (see File Format above).
+    """
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, size, 1 if unit else 0))
+        f.write(costs.tobytes())
+        f.write(moves.tobytes())
+
+
+"""
+DistanceTable Class
+-------------------
+A distance table loaded from a file. It gives the optimal cost of a stack
+and the flips of an optimal solution.
+"""
+class DistanceTable():
+    def __init__(self, path):
+        """
+        Loads the distance table stored at path with mmap.
+
+        Args
+        ----
+        path: string
+            The file written by save()
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, unit = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(path + " is not a distance table")
+        self.unit = unit == 1
+        self.positions = self.size - 1
+        entries = math.factorial(self.positions)
+        start = HEADER.size
+        stop = start + 2 * entries
+        self.costs = memoryview(self.data)[start:stop].cast("H")
+        self.moves = memoryview(self.data)[stop:stop + entries]
+
+
+    def index(self, state):
+        """
+        Args
+        ----
+        state: tuple
+            An arrangement of the stack of pancakes, with size pancakes
+            (including the plate)
+
+        Returns
+        -------
+        int
+            The index of the stack in the tables
+        """
+        # Shift the numbers so that the plate is number size
+        offset = state[-1] - self.size + 1
+        places = [0] * self.positions
+        for position in range(self.positions):
+            places[state[position] - offset] = position
+        return rank(places, self.positions)
+
+
+    def cost(self, state):
+        """
+        Returns
+        -------
+        int
+            The optimal cost of sorting the stack
+        """
+        return self.costs[self.index(state)]
+
+
+    def solve(self, state):
+        """
+        Follows the first flip of each stack from state to the sorted
+        stack.
+
+        Args
+        ----
+        state: list or tuple
+            An arrangement of the stack of pancakes
+
+        Returns
+        -------
+        list
+            The depth of each flip of an optimal solution, or None if the
+            table is not for stacks of this size
+        """
+        if len(state) != self.size:
+            return None
+        state = tuple(state)
+        flips = []
+        flip_depth = self.moves[self.index(state)]
+        while flip_depth != 0:
+            flips.append(flip_depth)
+            state = state[flip_depth - 1::-1] + state[flip_depth:]
+            flip_depth = self.moves[self.index(state)]
+        return flips
+
+
+def main():
+    """
+    Parse through command line arguments, and build a distance table
+    """
+    parser = argparse.ArgumentParser(
+        description="Build a table of the optimal cost of every stack of a "
+                    "given size")
+    parser.add_argument(dest = "size",
+                        type = int,
+                        help = "The length of the stack, including the plate")
+    parser.add_argument("--unit",
+                        action = "store_true",
+                        help = "Count the number of flips instead of the "
+                               "number of pancakes flipped")
+    parser.add_argument("-o", "--output",
+                        help = "The file to write the distance table to")
+    parser.add_argument("--check",
+                        action = "append",
+                        default = [],
+                        choices = HEURISTICS,
+                        metavar = "HEURISTIC",
+                        help = "Check that a heuristic never overestimates "
+                               "and is consistent on every stack. Can be given "
+                               "several times")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database for the heuristics that "
+                               "are checked")
+    args = parser.parse_args()
+
+    if args.size < 2 or args.size > 12:
+        parser.error("The size must be between 2 and 12")
+    if args.output is None and not args.check:
+        parser.error("Give the file to write to (-o) or a heuristic to "
+                     "check (--check)")
+
+    timer_start = timeit.default_timer()
+    costs, moves = build(args.size, args.unit)
+    if args.output is not None:
+        save(args.output, args.size, args.unit, costs, moves)
+        print("Distance table with", len(costs), "entries written to",
+              args.output)
+
+    failed = False
+    for name in args.check:
+        try:
+            heuristic = make_heuristic(name, args.pdb, args.size)
+        except (ValueError, OSError) as error:
+            print("Error:", error)
+            exit(1)
+        overestimates, inconsistencies, ratio = check_heuristic(
+            heuristic, args.size, costs, args.unit)
+        print(name + ":", overestimates, "stacks overestimated,",
+              inconsistencies, "inconsistent flips, on average",
+              str(round(100 * ratio, 1)) + "% of the optimal cost")
+        failed = failed or overestimates > 0 or inconsistencies > 0
+    timer_stop = timeit.default_timer()
+    print("Execution Time:", round(timer_stop - timer_start, 2), "s")
+    if failed:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
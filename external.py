@@ -0,0 +1,366 @@
+"""
+External-Memory Search
+----------------------
+Runs A* with the frontier and the visited states on disk instead of in
+memory, with delayed duplicate detection ("External A*", Edelkamp,
+Jabbar and Schroedl). The states are kept in buckets, one per backward
+cost g and heuristic h, and the buckets are expanded in order of total
+cost f = g + h, and of g within the same f. Since the heuristics are
+consistent, a child never lands in a bucket that has been expanded.
+
+Children are not checked against the visited states when they are
+generated. They are collected in memory, and when too many of them are
+waiting, each bucket's share is sorted and appended to the disk as a run.
+When a bucket is expanded, its runs are merged, which removes the
+duplicates in the bucket, and the merged states are subtracted from the
+visited buckets with the same h (which all have a lower g, so a state in
+them was reached more cheaply). The states that are left are written to
+the bucket's visited file and expanded. Every step reads and writes files
+from start to end, and only the states waiting to be written are in
+memory, so the memory used is bounded by the run size.
+
+A state is written as a record of one byte per pancake (shifted so that
+the smallest pancake is 0) and one byte for the last flip that led to it.
+There are no parent pointers: once the sorted stack is reached, the path
+is rebuilt backwards by undoing the last flip and looking up the previous
+state in its visited file (records are sorted and of fixed size, so this
+is a binary search).
+"""
+
+import heapq                # Merging Sorted Runs
+import logging              # For Debugging Functions
+import os                   # Files of the Buckets
+import shutil               # Removing the Spill Directory
+import tempfile             # Spill Directory
+
+from pancake import BudgetExceeded, astar, flip, replay
+
+# The number of states waiting in memory before they are written as runs
+RUN_SIZE = 1 << 20
+# The number of records read from a file at once
+BLOCK_SIZE = 4096
+
+
+def read_records(path, record_size):
+    """
+    Reads the records of a file in order.
+
+    Yields
+    ------
+    bytes
+        One record
+    """
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(record_size * BLOCK_SIZE)
+            if not block:
+                return
+            for start in range(0, len(block), record_size):
+                yield block[start:start + record_size]
+
+
+def find_record(path, key, record_size):
+    """
+    Finds the record of a state in a sorted file with a binary search.
+
+    Args
+    ----
+    path: string
+        A file of sorted records
+
+    key: bytes
+        The state, without the flip byte
+
+    record_size: int
+        The size of a record
+
+    Returns
+    -------
+    bytes
+        The record, or None if the state is not in the file
+    """
+    with open(path, "rb") as f:
+        low = 0
+        high = os.path.getsize(path) // record_size
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(middle * record_size)
+            record = f.read(record_size)
+            if record[:-1] < key:
+                low = middle + 1
+            elif record[:-1] > key:
+                high = middle
+            else:
+                return record
+    return None
+
+
+"""
+external Class
+--------------
+Runs External A* with its buckets in a temporary directory, which is
+removed when the search is over.
+"""
+class external(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None,
+                 spill_dir=None, run_size=RUN_SIZE):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats:
+            See astar
+
+        spill_dir: string
+            The directory in which the temporary directory of the buckets
+            is created. Default: the system's temporary directory
+
+        run_size: int
+            The largest number of states kept in memory before they are
+            written to disk
+        """
+        if len(initial_state) > 256:
+            raise ValueError("The external engine sorts at most 256 pancakes")
+        if run_size < 1:
+            raise ValueError("The run size must be at least 1")
+        super().__init__(initial_state, heuristic, stats)
+        self.spill_dir = spill_dir
+        self.run_size = run_size
+        self.offset = min(initial_state)
+        self.record_size = self.length + 1
+        self.bytes_written = 0
+        # The bucket being expanded
+        self.bucket = (0, self.root.forward_cost)
+
+
+    def collect_stats(self):
+        """
+        The counters were kept by explore()
+        """
+
+
+    def encode(self, state, flip_depth):
+        """
+        Returns
+        -------
+        bytes
+            The record of a state reached by a flip of flip_depth (0 for
+            the initial stack)
+        """
+        offset = self.offset
+        return bytes([pancake - offset for pancake in state] + [flip_depth])
+
+
+    def decode(self, record):
+        """
+        Returns
+        -------
+        tuple
+            The state of a record
+        """
+        offset = self.offset
+        return tuple(pancake + offset for pancake in record[:-1])
+
+
+    def explore(self):
+        """
+        Expands the buckets in order until the sorted stack is reached, and
+        rebuilds the solution
+        """
+        self.directory = tempfile.mkdtemp(prefix="pancake-", dir=self.spill_dir)
+        try:
+            self.solution = False
+            flips = self.search()
+            if flips is not None:
+                self.solution = replay(self.root, flips, self.heuristic)
+        finally:
+            shutil.rmtree(self.directory)
+        logging.debug("External search wrote %d bytes", self.bytes_written)
+
+
+    def search(self):
+        """
+        Returns
+        -------
+        list
+            The depth of each flip of the solution, or None if there is no
+            solution
+        """
+        # The run files and the states waiting in memory of each bucket
+        self.runs = {}
+        self.waiting = {}
+        self.waiting_count = 0
+        # The visited file of each bucket, and the g of the visited buckets
+        # of each h
+        self.visited_files = {}
+        self.visited_costs = {}
+
+        root = self.root
+        self.add((0, root.forward_cost), self.encode(root.state, 0))
+        while self.runs or self.waiting:
+            bucket = min(set(self.runs) | set(self.waiting),
+                         key=lambda bucket: (bucket[0] + bucket[1], bucket[0]))
+            self.bucket = bucket
+            goal = self.expand_bucket(bucket)
+            if goal is not None:
+                return self.solution_from(goal, bucket[0])
+        return None
+
+
+    def add(self, bucket, record):
+        """
+        Adds a state to the states waiting in memory, and writes them to
+        disk if there are too many
+        """
+        waiting = self.waiting.get(bucket)
+        if waiting is None:
+            waiting = self.waiting[bucket] = []
+        waiting.append(record)
+        self.waiting_count += 1
+        if self.waiting_count > self.stats.peak_open:
+            self.stats.peak_open = self.waiting_count
+        if self.waiting_count >= self.run_size:
+            self.spill()
+
+
+    def spill(self):
+        """
+        Sorts the waiting states of every bucket and writes them to a new
+        run of the bucket
+        """
+        for bucket, waiting in self.waiting.items():
+            waiting.sort()
+            runs = self.runs.setdefault(bucket, [])
+            path = os.path.join(self.directory, "run-%d-%d-%d"
+                                % (bucket[0], bucket[1], len(runs)))
+            self.write(path, waiting)
+            runs.append(path)
+        self.waiting = {}
+        self.waiting_count = 0
+
+
+    def write(self, path, records):
+        """
+        Writes records to a new file
+        """
+        with open(path, "wb") as f:
+            for record in records:
+                f.write(record)
+                self.bytes_written += self.record_size
+                self.stats.pushes += 1
+
+
+    def expand_bucket(self, bucket):
+        """
+        Merges the runs of a bucket, removes the duplicates and the
+        visited states, writes the rest to the bucket's visited file and
+        expands them.
+
+        Returns
+        -------
+        bytes
+            The record of the sorted stack, if it is in the bucket
+        """
+        stats = self.stats
+        budget = self.budget
+        backward_cost, forward_cost = bucket
+        record_size = self.record_size
+        sources = [read_records(path, record_size)
+                   for path in self.runs.pop(bucket, [])]
+        waiting = self.waiting.pop(bucket, [])
+        self.waiting_count -= len(waiting)
+        waiting.sort()
+        sources.append(waiting)
+        visited = heapq.merge(*[read_records(self.visited_files[(g, forward_cost)],
+                                             record_size)
+                                for g in self.visited_costs.get(forward_cost, [])])
+        visited_key = b""
+
+        path = os.path.join(self.directory,
+                            "visited-%d-%d" % (backward_cost, forward_cost))
+        self.visited_files[bucket] = path
+        self.visited_costs.setdefault(forward_cost, []).append(backward_cost)
+        last_key = None
+        goal = None
+        with open(path, "wb") as f:
+            for record in heapq.merge(*sources):
+                stats.pops += 1
+                key = record[:-1]
+                # Duplicates in the bucket are next to each other
+                if key == last_key:
+                    stats.duplicates += 1
+                    continue
+                last_key = key
+                # Move through the visited states up to this one
+                while visited_key is not None and visited_key < key:
+                    visited_record = next(visited, None)
+                    visited_key = (None if visited_record is None
+                                   else visited_record[:-1])
+                if visited_key == key:
+                    stats.duplicates += 1
+                    continue
+
+                f.write(record)
+                self.bytes_written += record_size
+                state = self.decode(record)
+                if state == self.goal:
+                    goal = record
+                    break
+                if budget is not None and budget.exceeded(stats, self.waiting_count):
+                    raise BudgetExceeded
+                self.expand(state, backward_cost, forward_cost, record[-1])
+        return goal
+
+
+    def expand(self, state, backward_cost, forward_cost, last_flip):
+        """
+        Adds the children of a state to the waiting states of their
+        buckets. The flip that undoes the last one is skipped.
+        """
+        stats = self.stats
+        stats.expanded += 1
+        after_flip = self.heuristic.after_flip
+        for flip_depth in range(2, self.length):
+            if flip_depth == last_flip:
+                continue
+            child_state = flip(state, flip_depth)
+            child_forward_cost = after_flip(state, forward_cost, flip_depth,
+                                            child_state)
+            self.add((backward_cost + flip_depth, child_forward_cost),
+                     self.encode(child_state, flip_depth))
+        stats.generated += self.length - 2
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The total cost of the bucket being expanded: buckets are
+            expanded in order of total cost
+        """
+        return sum(self.bucket)
+
+
+    def solution_from(self, goal, backward_cost):
+        """
+        Rebuilds the flips of the solution from the record of the sorted
+        stack, by undoing the last flip of each state and looking up the
+        previous state in the visited files.
+
+        Returns
+        -------
+        list
+            The depth of each flip of the solution
+        """
+        flips = []
+        record = goal
+        while record[-1] != 0:
+            flip_depth = record[-1]
+            flips.append(flip_depth)
+            state = flip(self.decode(record), flip_depth)
+            backward_cost -= flip_depth
+            path = self.visited_files[(backward_cost, self.heuristic(state))]
+            record = find_record(path, self.encode(state, 0)[:-1],
+                                 self.record_size)
+        flips.reverse()
+        return flips
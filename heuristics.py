@@ -0,0 +1,332 @@
+"""
+Heuristics
+----------
+Every heuristic is an object that can be called on a state to get its
+forward cost (an estimate of the number of pancakes that still have to be
+flipped). It also has an after_flip method that gives the forward cost of
+the state reached by a flip, which lets a heuristic update the value of the
+parent instead of starting from scratch. All heuristics here never
+overestimate the cost to the goal, and taking the maximum of several of
+them keeps this guarantee.
+"""
+
+# The heuristics that can be chosen by name
+HEURISTICS = ["gap", "landmark", "pdb", "max", "zero"]
+
+
+def gap(state):
+    """
+    The gap heuristic is defined by the number of stack positions for which
+    the pancake at that position is not of adjacent size (+/- 1) to the
+    pancake below (specified in "Landmark Heuristics for the Pancake
+    Problem" by Malte Helmert.) Here, we also take the plate into
+    consideration because we want to make sure that the stack goes from
+    largest to smallest, starting from the plate.
+
+    Args
+    ----
+    state: tuple
+        An arrangement of the stack of pancakes
+
+    Returns
+    -------
+    h_gap: integer
+        The heuristic of the given state
+    """
+    h_gap = 0
+    prev_pancake = state[0]
+    for pancake in state[1:]:
+        if abs(pancake - prev_pancake) != 1:
+            h_gap += 1
+        prev_pancake = pancake
+    return h_gap
+
+
+def gap_after_flip(state, h_gap, flip_depth):
+    """
+    A flip only changes one adjacency: the pancakes at positions
+    flip_depth - 1 and flip_depth are no longer next to each other, and the
+    pancake on top lands on the pancake at position flip_depth instead. The
+    gap heuristic of the flipped state can therefore be derived from the
+    gap heuristic of the state before the flip in constant time.
+
+    Args
+    ----
+    state: tuple
+        An arrangement of the stack of pancakes before the flip
+
+    h_gap: integer
+        The gap heuristic of state
+
+    flip_depth: integer
+        The number of pancakes that will be flipped
+
+    Returns
+    -------
+    integer
+        The gap heuristic of the state after the flip
+    """
+    below = state[flip_depth]
+    if abs(state[flip_depth - 1] - below) != 1:
+        h_gap -= 1
+    if abs(state[0] - below) != 1:
+        h_gap += 1
+    return h_gap
+
+
+def landmark(state):
+    """
+    A lower bound of the cost of sorting a stack that takes into account
+    that a flip costs the number of pancakes flipped. It follows the
+    landmarks of "Landmark Heuristics for the Pancake Problem" (Helmert):
+    every gap must be removed by a flip of its own, since a flip of depth
+    k only changes the adjacency at position k.
+
+    Let m be the number of gaps and d the position of the deepest one (the
+    gap between positions d - 1 and d). Every pancake below it is in
+    place, and the pancake that belongs at position d - 1 is at some
+    position p above. That pancake can only be put in place by a flip of
+    depth d + q, where q is its position just before, and if it is moved
+    before that, a flip deeper than p is needed first. Each of the other
+    gaps needs a flip of at least 2 pancakes. This gives
+
+        d + p                        if m = 1
+        d + 2 (m - 1) + max(0, p - 1)   otherwise
+
+    which is never lower than twice the gap heuristic. It was checked to
+    never overestimate, and to be consistent, on every stack of up to 10
+    (see distance_table.py --check).
+
+    Args
+    ----
+    state: tuple
+        An arrangement of the stack of pancakes
+
+    Returns
+    -------
+    integer
+        The heuristic of the given state
+    """
+    gaps = 0
+    deepest = 0
+    for i in range(1, len(state)):
+        if abs(state[i] - state[i - 1]) != 1:
+            gaps += 1
+            deepest = i
+    if gaps == 0:
+        return 0
+    # The stack is sorted below the deepest gap, so the pancake that
+    # belongs just above it is one smaller than the pancake below it
+    position = state.index(state[deepest] - 1)
+    if gaps == 1:
+        return deepest + position
+    return deepest + 2 * (gaps - 1) + max(0, position - 1)
+
+
+"""
+GapHeuristic Class
+------------------
+The gap heuristic (see gap()), updated in constant time after a flip.
+"""
+class GapHeuristic():
+    def __call__(self, state):
+        """
+        Args
+        ----
+        state: tuple
+            An arrangement of the stack of pancakes
+
+        Returns
+        -------
+        integer
+            The heuristic of state
+        """
+        return gap(state)
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        """
+        Args
+        ----
+        state: tuple
+            An arrangement of the stack of pancakes before the flip
+
+        h: integer
+            The heuristic of state
+
+        flip_depth: integer
+            The number of pancakes that were flipped
+
+        flipped: tuple
+            The arrangement of the stack after the flip
+
+        Returns
+        -------
+        integer
+            The heuristic of flipped
+        """
+        return gap_after_flip(state, h, flip_depth)
+
+
+"""
+RelativeGapHeuristic Class
+--------------------------
+The gap heuristic towards any target stack instead of the sorted one: it
+counts the adjacent pancakes that are not next to each other in the
+target. Flips are their own inverse, so the argument for the gap heuristic
+holds for any target. This is what a search backwards from the sorted
+stack uses to estimate the cost of reaching the initial stack.
+"""
+class RelativeGapHeuristic():
+    def __init__(self, target):
+        """
+        Args
+        ----
+        target: tuple
+            The stack the heuristic estimates the cost of reaching
+        """
+        self.position = {pancake: i for i, pancake in enumerate(target)}
+
+
+    def __call__(self, state):
+        """
+        Returns
+        -------
+        integer
+            The number of adjacent pancakes of state that are not adjacent
+            in the target
+        """
+        position = self.position
+        h_gap = 0
+        for i in range(1, len(state)):
+            if abs(position[state[i]] - position[state[i - 1]]) != 1:
+                h_gap += 1
+        return h_gap
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        """
+        Only the adjacency at positions flip_depth - 1 and flip_depth
+        changes (see gap_after_flip()).
+        """
+        position = self.position
+        below = position[state[flip_depth]]
+        if abs(position[state[flip_depth - 1]] - below) != 1:
+            h -= 1
+        if abs(position[state[0]] - below) != 1:
+            h += 1
+        return h
+
+
+"""
+LandmarkHeuristic Class
+-----------------------
+The landmark heuristic (see landmark()). The deepest gap can move with
+any flip, so it is computed again after every flip.
+"""
+class LandmarkHeuristic():
+    def __call__(self, state):
+        return landmark(state)
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        return landmark(flipped)
+
+
+"""
+ZeroHeuristic Class
+-------------------
+A heuristic that is always 0, which turns A* into uniform-cost search.
+"""
+class ZeroHeuristic():
+    def __call__(self, state):
+        return 0
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        return 0
+
+
+"""
+MaxHeuristic Class
+------------------
+The maximum over several heuristics. Since none of them overestimates,
+neither does their maximum.
+"""
+class MaxHeuristic():
+    def __init__(self, heuristics):
+        """
+        Args
+        ----
+        heuristics: list
+            The heuristic objects to take the maximum of
+        """
+        self.heuristics = list(heuristics)
+
+
+    def __call__(self, state):
+        """
+        Returns
+        -------
+        integer
+            The largest of the heuristics of state
+        """
+        return max(heuristic(state) for heuristic in self.heuristics)
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        """
+        The maximum cannot be updated from the maximum of the parent, so
+        it is computed again on the flipped state.
+        """
+        return self(flipped)
+
+
+def make_heuristic(name, pdb_paths=(), size=None):
+    """
+    Creates a heuristic from its name.
+
+    Args
+    ----
+    name: string
+        "gap" for the gap heuristic, "landmark" for the landmark
+        heuristic (which counts the pancakes flipped), "pdb" for the
+        maximum over the given pattern databases, "max" for the maximum of
+        the gap heuristic and the given pattern databases, and "zero" for
+        no heuristic at all (uniform-cost search)
+
+    pdb_paths: list
+        The files of the pattern databases (see pattern_database.py)
+
+    size: int
+        If given, the length of the stacks (including the plate) that will
+        be searched. Every pattern database must be built for this size.
+
+    Returns
+    -------
+    heuristic object
+    """
+    if name not in HEURISTICS:
+        raise ValueError("Unknown heuristic: " + str(name))
+    if name == "gap":
+        return GapHeuristic()
+    if name == "landmark":
+        return LandmarkHeuristic()
+    if name == "zero":
+        return ZeroHeuristic()
+
+    from pattern_database import PatternDatabase
+    if not pdb_paths:
+        raise ValueError("The " + name + " heuristic needs at least one "
+                         "pattern database")
+    pdbs = [PatternDatabase(path) for path in pdb_paths]
+    for pdb in pdbs:
+        if size is not None and pdb.size != size:
+            raise ValueError("The pattern database " + pdb.path + " is for "
+                             "stacks of size " + str(pdb.size) + ", not "
+                             + str(size))
+    if name == "max":
+        return MaxHeuristic([GapHeuristic()] + pdbs)
+    if len(pdbs) == 1:
+        return pdbs[0]
+    return MaxHeuristic(pdbs)
@@ -0,0 +1,335 @@
+"""
+Incremental Search
+------------------
+Solves a stream of stacks in which each stack is close to the ones before
+it (e.g. one flip or one swap away), reusing the searches of the previous
+stacks instead of starting again. This is Tree Adaptive A* ("Tree Adaptive
+A*", Hernandez, Sun, Koenig and Meseguer, 2011), from the same family of
+incremental searches as LPA* and D* Lite.
+
+Every stack has the same goal, the sorted stack, and a flip always costs
+the same, so nothing that a search has learned about the cost of sorting
+a state ever becomes wrong; only the start changes. Two things are kept
+between searches:
+
+* After a search finds a solution of cost C, every state s it expanded
+  with backward cost g(s) needs at least C - g(s) to be sorted (or there
+  would be a cheaper solution). These learned costs replace the heuristic
+  where they are larger, so later searches are better informed. The
+  heuristic stays consistent, so every solution is still optimal.
+* The states of every solution found so far, with the next flip towards
+  the sorted stack, form a tree of optimal paths whose costs are exact. A
+  search stops as soon as it takes one of them from the frontier, and
+  follows the tree to the sorted stack. A stack that was already on a
+  solution is solved without expanding anything.
+
+D* Lite searches backwards from the goal and keeps g and rhs for every
+state. There, moving the start changes the key of every state in the
+queue, and re-keying them costs more than it saves here, since no edge
+cost ever needs repairing.
+
+    solver = IncrementalSolver(LandmarkHeuristic())
+    for stack in stream:
+        result = solver.solve(stack)
+
+What is kept grows with every stack. With max_states, it is thrown away
+when it holds more states than that, and the next stack starts again. A
+stack of another length starts again as well.
+"""
+
+import argparse             # For Parsing Arguments
+import heapq                # Heaps for Priority Queue
+import json                 # Output Format
+import sys                  # Standard Input and Output
+import timeit               # Timing
+
+from batch import read_stacks
+from heuristics import HEURISTICS, GapHeuristic, make_heuristic
+from pancake import Budget, BudgetExceeded, check_stack, deepest_flip, flip
+from solver import SolveResult, check
+from stats import SearchStats, TimedHeuristic
+
+
+"""
+IncrementalSolver Class
+-----------------------
+A* from each stack to the sorted stack, with what the searches before it
+learned. Ties between states of the same total cost go to the state with
+the largest backward cost.
+"""
+class IncrementalSolver():
+    def __init__(self, heuristic=None, max_states=None):
+        """
+        Args
+        ----
+        heuristic: heuristic object
+            The heuristic that guides the searches (see heuristics.py). It
+            must be consistent. Default: the gap heuristic
+
+        max_states: int
+            The largest number of states kept between two stacks, or None
+            for no limit
+        """
+        if heuristic is None:
+            heuristic = GapHeuristic()
+        self.heuristic = heuristic
+        self.max_states = max_states
+        self.length = None
+
+
+    def reset(self, length):
+        """
+        Forgets what the previous searches learned.
+
+        Args
+        ----
+        length: int
+            The length of the stacks, including the plate
+        """
+        self.length = length
+        self.goal = tuple(range(1, length + 1))
+        # The least cost of sorting each state that was learned, and the
+        # next flip of an optimal solution of the states whose cost is
+        # exact (0 for the sorted stack)
+        self.learned = {self.goal: 0}
+        self.exact = {self.goal: 0}
+
+
+    def solve(self, stack, budget=None, timed=False):
+        """
+        Solves a stack, with what the searches of the stacks before it
+        learned.
+
+        Args
+        ----
+        stack: list or tuple
+            The stack of pancakes, the plate (the largest number) last
+
+        budget: Budget object
+            The limits of the search of this stack (see pancake.Budget).
+            Nothing is learned from a search that reaches them.
+
+        timed: boolean
+            Whether the time spent in the heuristic is measured (see
+            stats.py)
+
+        Returns
+        -------
+        SolveResult object
+            The result, whose stats only count the work done for this
+            stack
+
+        Raises
+        ------
+        InvalidStackError
+            If the stack cannot be sorted
+        """
+        stack = check(stack)
+        timer_start = timeit.default_timer()
+        stats = SearchStats(timed=timed)
+        # Number the pancakes from 1, so that stacks that only differ by an
+        # offset share what was learned
+        offset = stack[-1] - len(stack)
+        start = tuple(pancake - offset for pancake in stack)
+        if self.length != len(stack) or (
+                self.max_states is not None
+                and len(self.learned) > self.max_states):
+            self.reset(len(stack))
+
+        if budget is not None and budget.limited:
+            budget.start()
+        else:
+            budget = None
+        flips = None
+        lower_bound = None
+        try:
+            flips = self.search(start, stats, budget)
+        except BudgetExceeded as exceeded:
+            lower_bound = exceeded.args[0]
+        stats.search_time = timeit.default_timer() - timer_start
+        return SolveResult(stack, flips, None if flips is None else sum(flips),
+                           stats=stats, time=stats.search_time,
+                           exceeded=flips is None, lower_bound=lower_bound)
+
+
+    def search(self, start, stats, budget=None):
+        """
+        Runs A* from start until a state whose cost is exact is taken from
+        the frontier, then learns from the states that were expanded.
+
+        Returns
+        -------
+        list
+            The depth of each flip of an optimal solution
+
+        Raises
+        ------
+        BudgetExceeded
+            With the least total cost in the frontier (a lower bound of the
+            optimal cost), if the budget runs out
+        """
+        goal = self.goal
+        learned = self.learned
+        exact = self.exact
+        heuristic = self.heuristic
+        if stats.timed:
+            heuristic = TimedHeuristic(heuristic, stats)
+
+        def forward_cost(state):
+            h = heuristic(state)
+            known = learned.get(state)
+            return h if known is None or known < h else known
+
+        # g[state] is (backward cost, the flip that reached it)
+        g = {start: (0, 0)}
+        heap = [(forward_cost(start), 0, start)]
+        stats.pushes += 1
+        expanded = []
+        while True:
+            if budget is not None and budget.exceeded(stats, len(heap)):
+                stats.peak_closed = len(g)
+                raise BudgetExceeded(heap[0][0])
+            cost, negative_cost, state = heapq.heappop(heap)
+            stats.pops += 1
+            backward_cost = -negative_cost
+            if g[state][0] != backward_cost:
+                continue
+            if state in exact:
+                break
+
+            expanded.append(state)
+            stats.expanded += 1
+            # Flips below the pancakes already in place are never needed
+            # (see pancake.deepest_flip)
+            deepest = deepest_flip(state, goal)
+            for flip_depth in range(2, deepest + 1):
+                child = flip(state, flip_depth)
+                child_cost = backward_cost + flip_depth
+                known = g.get(child)
+                if known is not None and known[0] <= child_cost:
+                    stats.duplicates += 1
+                    continue
+                g[child] = (child_cost, flip_depth)
+                heapq.heappush(heap, (child_cost + forward_cost(child),
+                                      -child_cost, child))
+                stats.pushes += 1
+            stats.generated += deepest - 1
+            stats.pruned += self.length - 1 - deepest
+            if len(heap) > stats.peak_open:
+                stats.peak_open = len(heap)
+        stats.peak_closed = len(g)
+
+        # cost is the optimal cost: every state that was expanded needs at
+        # least cost - g to be sorted
+        for expanded_state in expanded:
+            bound = cost - g[expanded_state][0]
+            if bound > learned.get(expanded_state, 0):
+                learned[expanded_state] = bound
+
+        # The flips from the start to the state whose cost was exact, then
+        # along the tree to the sorted stack. The states of the new part of
+        # the path are added to the tree.
+        flips = []
+        while g[state][1] != 0:
+            flip_depth = g[state][1]
+            flips.append(flip_depth)
+            state = flip(state, flip_depth)
+        flips.reverse()
+        for flip_depth in flips:
+            exact[state] = flip_depth
+            state = flip(state, flip_depth)
+        while state != goal:
+            flip_depth = exact[state]
+            flips.append(flip_depth)
+            state = flip(state, flip_depth)
+        return flips
+
+
+def main():
+    """
+    Parse through command line arguments, and solve every stack of the input
+    in order, one after the other
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve a stream of similar stacks of pancakes, one per "
+                    "line, reusing what the searches of the stacks before "
+                    "learned")
+    parser.add_argument(dest = "input",
+                        nargs = "?",
+                        default = "-",
+                        help = "The file with the stacks, or - for the "
+                               "standard input. Default: %(default)s")
+    parser.add_argument("-o", "--output",
+                        default = "-",
+                        help = "The file the JSON results are written to, or - "
+                               "for the standard output. Default: %(default)s")
+    parser.add_argument("--heuristic",
+                        choices = HEURISTICS,
+                        default = "gap",
+                        help = "The heuristic that guides the search. "
+                               "Default: %(default)s")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database built with "
+                               "pattern_database.py. Can be given several times")
+    parser.add_argument("--max-states",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of states kept between stacks "
+                               "after which the searches start again")
+    parser.add_argument("--deadline",
+                        type = float,
+                        metavar = "SECONDS",
+                        help = "How long the search of a stack may run")
+    parser.add_argument("--max-expansions",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of nodes the search of a stack may "
+                               "expand")
+    parser.add_argument("--stats",
+                        action = "store_true",
+                        help = "Add all the counters of the search to every result")
+    args = parser.parse_args()
+
+    # The heuristic is loaded for the size of the stacks, so that pattern
+    # databases are checked against it. A stack of another size starts
+    # again anyway (see IncrementalSolver.solve).
+    solver = None
+    size = None
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    timer_start = timeit.default_timer()
+    count = 0
+    with source, output:
+        for number, stack in read_stacks(source):
+            count += 1
+            if isinstance(stack, str):
+                result = {"line": number, "error": stack}
+            else:
+                result = {"line": number, "stack": stack}
+                error = check_stack(stack)
+                try:
+                    if error is not None:
+                        raise ValueError(error)
+                    if size != len(stack):
+                        solver = IncrementalSolver(
+                            make_heuristic(args.heuristic, args.pdb,
+                                           len(stack)),
+                            args.max_states)
+                        size = len(stack)
+                    outcome = solver.solve(stack, Budget(args.deadline,
+                                                         args.max_expansions))
+                    result.update(outcome.as_dict(args.stats))
+                except (ValueError, OSError) as error:
+                    result["error"] = str(error)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    timer_stop = timeit.default_timer()
+    print("Solved", count, "stacks in", round(timer_stop - timer_start, 2), "s",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,164 @@
 import argparse             # For Parsing Arguments
 import logging              # For Debugging Functions
 import heapq                # Heaps for Priority Queue
-import copy                 # For Deep Copying
+import os                   # Page Size
+import sys                  # Platform
 import timeit               # Timing
 
+from heuristics import HEURISTICS, GapHeuristic, gap, gap_after_flip
+from stats import SearchStats, TimedHeuristic, TimedQueue
+
+
+def flip(state, flip_depth):
+    """
+    Flip a stack of pancakes at a given flip_depth. States are immutable
+    tuples, so a new state is returned and the given one is left untouched.
+    The top flip_depth pancakes are reversed with a single slice.
+
+    Args
+    ----
+    state: tuple
+        An arrangement of the stack of pancakes
+
+    flip_depth: integer
+        The number of pancakes that will be flipped
+
+    Returns
+    -------
+    tuple
+        The arrangement of the stack after the flip
+    """
+    return state[flip_depth - 1::-1] + state[flip_depth:]
+
+
+def deepest_flip(state, goal):
+    """
+    The deepest flip that leaves the pancakes that are already in place at
+    the bottom of the stack (the plate and the run above it) where they
+    are. No other flip is needed to sort the stack optimally: removing the
+    pancakes of that run from any solution leaves a solution of the top of
+    the stack in which every flip moves as many pancakes or fewer.
+
+    Args
+    ----
+    state: tuple
+        An arrangement of the stack of pancakes
+
+    goal: tuple
+        The sorted stack
+
+    Returns
+    -------
+    int
+        The depth of the deepest flip that is needed (0 if the stack is
+        sorted)
+    """
+    position = len(state) - 2
+    while position >= 0 and state[position] == goal[position]:
+        position -= 1
+    return position + 1
+
+
+def redundant_flips(length, moves):
+    """
+    Finds the flips that end a sequence of at most moves flips that can be
+    replaced by a strictly cheaper sequence with the same effect (e.g.
+    flipping 3, 2 and 3 pancakes does what flipping 2, 3 and 2 does, for 1
+    less). Such a sequence is never part of an optimal solution, so the
+    flip that ends it can be skipped. Flips move positions, not pancakes,
+    so two sequences that have the same effect on one stack have the same
+    effect on every stack of that length, and the sequences are compared
+    on the sorted stack.
+
+    Args
+    ----
+    length: int
+        The length of the stacks, including the plate
+
+    moves: int
+        The length of the longest sequences that are compared
+
+    Returns
+    -------
+    dict
+        For the last flips of a path (the most recent first, at most
+        moves - 1 of them), the flips that can be skipped after them.
+        Paths whose last flips are not in it skip nothing.
+    """
+    identity = tuple(range(length))
+    # Every sequence of at most moves flips (never the same flip twice in a
+    # row) with the stack it reaches and its cost, and the cheapest cost of
+    # reaching each of those stacks
+    layer = [((), identity, 0)]
+    sequences = list(layer)
+    cheapest = {identity: 0}
+    for _ in range(moves):
+        next_layer = []
+        for flips, state, cost in layer:
+            for flip_depth in range(2, length):
+                if flips and flips[-1] == flip_depth:
+                    continue
+                child = flip(state, flip_depth)
+                child_cost = cost + flip_depth
+                next_layer.append((flips + (flip_depth,), child, child_cost))
+                if child_cost < cheapest.get(child, child_cost + 1):
+                    cheapest[child] = child_cost
+        sequences.extend(next_layer)
+        layer = next_layer
+
+    # rules[history] holds the flips that end a redundant sequence after
+    # exactly the flips of history
+    rules = {}
+    for flips, state, cost in sequences:
+        if flips and cheapest[state] < cost:
+            rules.setdefault(flips[-2::-1], set()).add(flips[-1])
+
+    # A path skips the flips of every rule whose history is a suffix of it
+    table = {}
+    for flips, state, cost in sequences:
+        if len(flips) >= moves:
+            continue
+        history = flips[::-1]
+        skip = set()
+        for size in range(len(history) + 1):
+            skip.update(rules.get(history[:size], ()))
+        if skip:
+            table[history] = frozenset(skip)
+    return table
+
+
+class InvalidStackError(ValueError):
+    """
+    Raised when a stack of pancakes cannot be sorted (see check_stack())
+    """
+
+
+def check_stack(stack):
+    """
+    Checks that the largest number represents the plate and is at the
+    bottom, and that the stack contains only consecutive integers.
+
+    Args
+    ----
+    stack: list or tuple
+        An arrangement of the stack of pancakes
+
+    Returns
+    -------
+    string
+        A description of what is wrong with the stack, or None if the stack
+        is valid
+    """
+    if len(stack) == 0:
+        return "The stack of pancakes is empty."
+    for pancake in stack:
+        if pancake > stack[-1]:
+            return "The plate (the largest number) must be at the bottom."
+    if sorted(stack) != list(range(min(stack), max(stack) + 1)):
+        return "The stack of pancakes should yield contain consecutive numbers when sorted."
+    return None
+
+
 """
 Node Class
 ----------
@@ -11,15 +166,24 @@ Each nodes represents a series of steps taken to arrive at a certain state,
 which is recorded by the parent attribute. This means that there might be
 multiple nodes for one given state. However, there are no two nodes with
 the same state and the same parent.
+
+Nodes are small records (they use __slots__) that share their parent
+instead of copying it, so that millions of them fit in memory. The
+heuristic (forward cost), the backward cost and the total cost are
+computed once when a node is created and stored on the node.
 """
 class Node: 
-    def __init__(self, state, parent, order_added):
+    __slots__ = ("state", "parent", "order_added", "flip_depth",
+                 "backward_cost", "forward_cost", "cost")
+
+    def __init__(self, state, parent, order_added, flip_depth=None,
+                 forward_cost=None):
         """
         Creates a new Node Object
 
         Args
         ----
-        state: array
+        state: tuple
             An arrangement of the stack of pancakes
 
         parent: Node object
@@ -27,11 +191,30 @@ class Node:
 
         order_added: int
             The number of nodes that have been added before this one
+
+        flip_depth: int
+            The number of pancakes flipped to get from the parent to this
+            node. None for the root.
+
+        forward_cost: int
+            The heuristic of the state, if it is already known. Otherwise
+            it is computed from scratch.
         """
         self.state = state
         self.parent = parent    # Keeps track of the parent of each node
-        self.backward_cost = 0
         self.order_added = order_added
+        # We save the flip depth so that it can be printed out with the
+        # solution. The backward cost is how many pancakes have been
+        # flipped since the root.
+        self.flip_depth = flip_depth
+        if parent is None:
+            self.backward_cost = 0
+        else:
+            self.backward_cost = parent.backward_cost + flip_depth
+        if forward_cost is None:
+            forward_cost = gap(state)
+        self.forward_cost = forward_cost
+        self.cost = forward_cost + self.backward_cost
     
 
     def __lt__(self, other):
@@ -40,83 +223,156 @@ class Node:
         and the order in which it was added takes second priority. The
         latter can never be the same between two nodes, so there is no need
         for a third priority. 
-        
-        This comparison operator will be used when nodes are added to the
-        priority queue.
 
         Args
         ----
         other: Node object
             Another node object
         """
-        if self.total_cost() != other.total_cost():
-            return self.total_cost() < other.total_cost()
+        if self.cost != other.cost:
+            return self.cost < other.cost
         else:
             return self.order_added < other.order_added
 
 
     def total_cost(self):
         """
-        Calculates the total cost of a flip, which is the sum of the
-        heuristic function (forward cost) and the number of pancakes that
-        have been flipped (backward cost)
+        The total cost of a node is the sum of the heuristic function
+        (forward cost) and the number of pancakes that have been flipped
+        (backward cost)
         
         Returns
         -------
-        The total cost of a flip
+        The total cost of a node
         """
-        return self.heuristic() + self.backward_cost
+        return self.cost
     
 
     def heuristic(self):
         """
-        The heuristic function is defined by the number of stack positions
-        for which the pancake at that position is not of adjacent size (+/-
-        1) to the pancake below (specified in "Landmark Heuristics for the
-        Pancake Problem" by Malte Helmert.) Here, we also take the plate
-        into consideration because we want to make sure that the stack
-        goes from largest to smallest, starting from the plate.
-
         Returns
         -------
-        h_gap: integer
-            The heuristic of the current state
-        """
-        h_gap = 0
-        prev_pancake = self.state[0]
-        for pancake in self.state[1:]:
-            if abs(pancake - prev_pancake) != 1:
-                h_gap += 1
-            prev_pancake = pancake
-        return h_gap
+        integer
+            The heuristic of the current state, computed when the node was
+            created
+        """
+        return self.forward_cost
     
 
-    def flip(self, flip_depth):
+    def child(self, flip_depth, order_added, heuristic=None):
         """
-        Flip a stack of pancakes at a given flip_depth. 
+        Creates the node that is reached by flipping the stack of this node
+        at a given flip_depth. Only the new node is allocated: the state is
+        built with one slice-reverse, the ancestors are shared and the
+        heuristic is updated from the heuristic of this node.
 
         Args
         ----
         flip_depth: integer
             The number of pancakes that will be flipped
+
+        order_added: int
+            The number of nodes that have been added before the child
+
+        heuristic: heuristic object
+            The heuristic used for this search (see heuristics.py). The gap
+            heuristic is used if none is given.
+
+        Returns
+        -------
+        Node object
+            The child node
         """
-        # We save this information as an attribute so that the depth of
-        # flip can be printed out with the solution
-        self.flip_depth = flip_depth
-        logging.debug("Before flipping: "), logging.debug(self.state)
+        state = flip(self.state, flip_depth)
+        if heuristic is None:
+            forward_cost = gap_after_flip(self.state, self.forward_cost,
+                                          flip_depth)
+        else:
+            forward_cost = heuristic.after_flip(self.state, self.forward_cost,
+                                                flip_depth, state)
+        return Node(state, self, order_added, flip_depth, forward_cost)
+
+
+def replay(root, flip_depths, heuristic=None):
+    """
+    Builds the chain of nodes that is reached by applying a sequence of
+    flips to a root node. This is used by searches that do not keep nodes
+    around (e.g. IDA*) so that their solution can be printed like the
+    solution of A*.
+
+    Args
+    ----
+    root: Node object
+        The node to start from
+
+    flip_depths: list
+        The depth of each flip, in order
+
+    heuristic: heuristic object
+        The heuristic used for the search (see Node.child)
+
+    Returns
+    -------
+    Node object
+        The node reached after the last flip
+    """
+    node = root
+    for order_added, flip_depth in enumerate(flip_depths, root.order_added + 1):
+        node = node.child(flip_depth, order_added, heuristic)
+    return node
+
+
+def greedy_flips(state, heuristic=None):
+    """
+    Sorts a stack quickly, without searching, for when a search ran out of
+    budget. While some flip lowers the heuristic, the flip that lowers it
+    the most is taken. Then the pancakes that are left are put in place
+    from the largest to the smallest, each with at most two flips (one to
+    bring it to the top, one to flip it down to its place).
+
+    Args
+    ----
+    state: tuple
+        The stack to sort
 
-        # We swap the first and the last pancake in the range of the flip
-        # depth. In the case where there is an odd number of pancakes, the
-        # middle pancake would just be swapped with itself
-        for x in range(int(flip_depth / 2)):
-            temp = self.state[x]
-            self.state[x] = self.state[flip_depth - x - 1]
-            self.state[flip_depth - x - 1] = temp
+    heuristic: heuristic object
+        The heuristic that is lowered. Default: the gap heuristic
 
-        # The backward cost is how many pancakes have been flipped (i.e.
-        # flip_depth)
-        self.backward_cost += flip_depth
-        logging.debug("After flipping: "), logging.debug(self.state)
+    Returns
+    -------
+    list
+        The depth of each flip, in order. The solution is not optimal.
+    """
+    if heuristic is None:
+        heuristic = GapHeuristic()
+    state = tuple(state)
+    goal = tuple(sorted(state))
+    flips = []
+    forward_cost = heuristic(state)
+    while forward_cost > 0:
+        best = None
+        for flip_depth in range(2, len(state)):
+            child = flip(state, flip_depth)
+            child_forward_cost = heuristic.after_flip(state, forward_cost,
+                                                      flip_depth, child)
+            if child_forward_cost < (forward_cost if best is None else best[1]):
+                best = (flip_depth, child_forward_cost, child)
+        if best is None:
+            break
+        flips.append(best[0])
+        forward_cost = best[1]
+        state = best[2]
+
+    for position in range(len(state) - 2, 0, -1):
+        if state[position] == goal[position]:
+            continue
+        index = state.index(goal[position])
+        if index > 0:
+            flips.append(index + 1)
+            state = flip(state, index + 1)
+        flips.append(position + 1)
+        state = flip(state, position + 1)
+    return flips
 
 
 """
@@ -126,20 +382,34 @@ Python has a Queue library that contains a priority queue, but I'm not
 using it here because it doesn't has certain functions that check whether
 if an element is already in the queue, or replace an element in the
 queue. Both of these functions are needed to implement A*.
+
+Alongside the heap, the priority queue keeps an index (a dictionary keyed
+by state) that holds the best backward cost of every state that is still
+waiting in the queue. This makes has() O(1) and replace() O(log n). When a
+node is replaced, the old node is not removed from the heap. Instead, it
+becomes stale and is skipped when it reaches the top of the heap (lazy
+deletion).
 """
 class PriorityQueue():
     def __init__(self):
         """
-        Creates a heap, which is represented by a Python list
+        Creates a heap, which is represented by a Python list, and the index
+        of the states that are in the heap
         """
         self.heap = []
+        self.index = {}
+        # Counts the pushes and pops of the heap, including stale nodes
+        self.pushes = 0
+        self.pops = 0
+        # The heap is only printed if debugging is on
+        self.debug = logging.getLogger().isEnabledFor(logging.DEBUG)
     
 
     def __str__(self):
         """
         Printing for debugging
         """
-        return str([node.state for node in self.heap])
+        return str([entry[2].state for entry in self.heap])
     
 
     def put(self, node):
@@ -148,38 +418,68 @@ class PriorityQueue():
         order of the priority queue is determined by the total cost
         determined in the Node class (the smaller the higher priority). If
         two nodes have the same total cost, then the node that was first
-        introduced has higher priority.
+        introduced has higher priority. Each node is pushed as a tuple of
+        its (precomputed) total cost, the order in which it was added and
+        the node itself, so that the heap compares plain integers.
 
         Args
         ---
         node: Node object
         """
-        heapq.heappush(self.heap, node)
-        logging.debug("Priority Queue now contains: "), logging.debug(self)
+        heapq.heappush(self.heap, (node.cost, node.order_added, node))
+        self.index[node.state] = node.backward_cost
+        self.pushes += 1
+        if self.debug:
+            logging.debug("Priority Queue now contains: %s", self)
     
     
     def get(self):
         """
-        To get the node with the least cost, pop from the heap.
+        To get the node with the least cost, pop from the heap. Nodes that
+        have been replaced by a cheaper node with the same state are
+        skipped.
 
         Returns
         -------
         top: Node object
             Returns the top element of the min heap
         """
-        top = heapq.heappop(self.heap);
-        return top
+        while True:
+            top = heapq.heappop(self.heap)[2]
+            self.pops += 1
+            key = top.state
+            if self.index.get(key) == top.backward_cost:
+                del self.index[key]
+                return top
     
     
+    def peek(self):
+        """
+        Removes the stale nodes from the top of the heap, without popping
+        the node with the least cost.
+
+        Returns
+        -------
+        Node object
+            The node that get() would return next
+        """
+        while True:
+            top = self.heap[0][2]
+            if self.index.get(top.state) == top.backward_cost:
+                return top
+            heapq.heappop(self.heap)
+            self.pops += 1
+
+
     def has(self, state):
         """
-        Loop through the heap to see if an existing state is already in a
-        node in the the priority queue. If this is the case, then return
-        true. Otherwise, return false.
+        Look up the index to see if an existing state is already in a node
+        in the the priority queue. If this is the case, then return true.
+        Otherwise, return false.
 
         Args
         ----
-        state: array
+        state: tuple
             The state for which we are checking whether if it already
             exists in the heap
 
@@ -188,27 +488,30 @@ class PriorityQueue():
         boolean
             True if the state is already in the heap, false otherwise
         """
-        for node in self.heap:
-            if node.state == state:
-                return True
-        return False
+        return state in self.index
     
     
     def replace(self, new_node):
         """
         If a new node is lower in cost than an existing node in the priority
-        queue, then replace the old node with the new node.
+        queue, then replace the old node with the new node. The old node
+        stays in the heap, but it will be skipped by get().
 
         Args
         ----
         new_node: Node object
             The new node that would replace one already in the priority
             queue should it have a lower total_cost
+
+        Returns
+        -------
+        boolean
+            True if the new node replaced the old one, False otherwise
         """
-        for node in self.heap:
-            if node.state == new_node.state:
-                if new_node.total_cost() < node.total_cost():
-                    self.heap[self.heap.index(node)] = new_node
+        if new_node.backward_cost < self.index[new_node.state]:
+            self.put(new_node)
+            return True
+        return False
     
     
     def empty(self):
@@ -218,7 +521,305 @@ class PriorityQueue():
         boolean
             returns True if the priority queue is empty, False otherwise
         """
-        return len(self.heap) == 0
+        return len(self.index) == 0
+
+"""
+BucketQueue Class
+-----------------
+A priority queue with the same methods as PriorityQueue, for costs that
+are small non-negative integers, as they are here (the number of pancakes
+flipped plus the heuristic). Instead of a heap, there is one bucket per
+total cost, so a node is pushed in constant time and the next node is
+found by moving up from the lowest bucket that may not be empty (Dial's
+algorithm). Inside a bucket, nodes are kept by backward cost and the node
+that has come the furthest (the largest backward cost, i.e. the smallest
+heuristic) is popped first, most recent first. Nodes that have been
+replaced are skipped as in PriorityQueue.
+"""
+class BucketQueue():
+    def __init__(self):
+        """
+        Creates the buckets and the index of the states that are in them
+        """
+        # buckets[f][g] holds the nodes of total cost f and backward cost g
+        self.buckets = []
+        # tops[f] is the largest backward cost that may have nodes in
+        # buckets[f]. All the buckets below lowest are empty.
+        self.tops = []
+        self.lowest = 0
+        self.index = {}
+        # Counts the pushes and pops, including stale nodes
+        self.pushes = 0
+        self.pops = 0
+        self.debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+    def __str__(self):
+        """
+        Printing for debugging
+        """
+        return str([node.state for bucket in self.buckets
+                    for nodes in bucket for node in nodes])
+
+
+    def put(self, node):
+        """
+        Adds a node to the bucket of its total and backward cost.
+
+        Args
+        ---
+        node: Node object
+        """
+        cost = node.cost
+        backward_cost = node.backward_cost
+        while len(self.buckets) <= cost:
+            self.buckets.append([])
+            self.tops.append(-1)
+        bucket = self.buckets[cost]
+        while len(bucket) <= backward_cost:
+            bucket.append([])
+        bucket[backward_cost].append(node)
+        if backward_cost > self.tops[cost]:
+            self.tops[cost] = backward_cost
+        if cost < self.lowest:
+            self.lowest = cost
+        self.index[node.state] = backward_cost
+        self.pushes += 1
+        if self.debug:
+            logging.debug("Priority Queue now contains: %s", self)
+
+
+    def top_nodes(self):
+        """
+        Moves lowest and the top of its bucket up to the first nodes that
+        are left. There must be at least one node in the queue.
+
+        Returns
+        -------
+        list
+            The nodes with the least total cost and, among them, the largest
+            backward cost
+        """
+        while True:
+            bucket = self.buckets[self.lowest]
+            top = self.tops[self.lowest]
+            while top >= 0 and not bucket[top]:
+                top -= 1
+            self.tops[self.lowest] = top
+            if top >= 0:
+                return bucket[top]
+            self.lowest += 1
+
+
+    def peek(self):
+        """
+        Removes the stale nodes from the top of the queue, without popping
+        the node with the least cost.
+
+        Returns
+        -------
+        Node object
+            The node that get() would return next
+        """
+        while True:
+            nodes = self.top_nodes()
+            top = nodes[-1]
+            if self.index.get(top.state) == top.backward_cost:
+                return top
+            nodes.pop()
+            self.pops += 1
+
+
+    def get(self):
+        """
+        Returns
+        -------
+        Node object
+            The node with the least total cost
+        """
+        top = self.peek()
+        self.top_nodes().pop()
+        self.pops += 1
+        del self.index[top.state]
+        return top
+
+
+    def has(self, state):
+        """
+        Returns
+        -------
+        boolean
+            True if the state is already in the queue, false otherwise
+        """
+        return state in self.index
+
+
+    def replace(self, new_node):
+        """
+        Adds a node if it is cheaper than the node of the same state that is
+        already in the queue.
+
+        Returns
+        -------
+        boolean
+            True if the new node replaced the old one, False otherwise
+        """
+        if new_node.backward_cost < self.index[new_node.state]:
+            self.put(new_node)
+            return True
+        return False
+
+
+    def empty(self):
+        """
+        Returns
+        -------
+        boolean
+            returns True if the queue is empty, False otherwise
+        """
+        return len(self.index) == 0
+
+
+# The priority queues that can be chosen by name
+QUEUES = {"heap": PriorityQueue, "bucket": BucketQueue}
+
+
+# The number of budget checks between two readings of the clock and of the
+# memory
+CHECK_INTERVAL = 64
+
+
+def resident_memory():
+    """
+    Returns
+    -------
+    int
+        The memory used by the process, in bytes, or None if it cannot be
+        read. Where /proc is missing, this is the peak memory instead.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        # Imported here because it is missing on Windows
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The peak is in bytes on macOS and in KiB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised inside a search when its budget runs out. run() catches it and
+    ends the search without a solution.
+    """
+
+
+"""
+Budget Class
+------------
+Limits on a search: a number of seconds, a number of nodes expanded, a
+number of states waiting in the frontier and the memory of the process.
+The counters are checked every time, and the clock and the memory every
+CHECK_INTERVAL checks, so that checking is cheap enough for every
+expansion. The clock starts when start() is called, usually when the
+search starts running.
+"""
+class Budget():
+    def __init__(self, seconds=None, expansions=None, states=None,
+                 megabytes=None):
+        """
+        Args
+        ----
+        seconds: float
+            The longest time the search may run, or None for no limit
+
+        expansions: int
+            The largest number of nodes the search may expand, or None for
+            no limit
+
+        states: int
+            The largest number of states the frontier may hold, or None
+            for no limit
+
+        megabytes: float
+            The most memory the process may use, in MiB, or None for no
+            limit
+        """
+        if megabytes is not None and resident_memory() is None:
+            raise ValueError("The memory used cannot be read on this system")
+        self.seconds = seconds
+        self.expansions = expansions
+        self.states = states
+        self.memory = None if megabytes is None else megabytes * (1 << 20)
+        self.deadline = None
+        self.checks = 0
+
+
+    @property
+    def limited(self):
+        """
+        True if there is at least one limit
+        """
+        return (self.seconds is not None or self.expansions is not None
+                or self.states is not None or self.memory is not None)
+
+
+    def start(self):
+        """
+        Starts the clock
+        """
+        self.checks = 0
+        if self.seconds is not None:
+            self.deadline = timeit.default_timer() + self.seconds
+
+
+    def expired(self):
+        """
+        Returns
+        -------
+        boolean
+            True if the deadline has passed or the process uses too much
+            memory
+        """
+        if self.deadline is not None and timeit.default_timer() >= self.deadline:
+            return True
+        return self.memory is not None and resident_memory() >= self.memory
+
+
+    def exceeded(self, stats, open_size=0, expansions=1):
+        """
+        Args
+        ----
+        stats: SearchStats object
+            The counters of the search
+
+        open_size: int
+            The number of states in the frontier
+
+        expansions: int
+            The number of nodes expanded since the last check, for the
+            searches that expand several nodes at once. The clock and the
+            memory are read once every CHECK_INTERVAL of them.
+
+        Returns
+        -------
+        boolean
+            True if the search has used up its budget
+        """
+        if self.expansions is not None and stats.expanded >= self.expansions:
+            return True
+        if self.states is not None and open_size > self.states:
+            return True
+        previous = self.checks
+        self.checks += expansions
+        return (self.checks // CHECK_INTERVAL != previous // CHECK_INTERVAL
+                and self.expired())
+
 
 """
 astar Class
@@ -226,27 +827,78 @@ astar Class
 Verifies inputs, runs, and prints the results of an A* algorithm.
 """
 class astar():
-    def __init__(self, initial_state):
+    def __init__(self, initial_state, heuristic=None, stats=None,
+                 queue="heap", prune_moves=0):
         """
         Creates a new instance of the A* search algorithm on the default or
         user provided stack of pancakes. 
 
         Args
         ----
-        initial_state: array
+        initial_state: list or tuple
             The initial state is given by user input. It is the starting
             of the pancake problem.
+
+        heuristic: heuristic object
+            The heuristic that guides the search (see heuristics.py).
+            Default: the gap heuristic
+
+        stats: SearchStats object
+            Where the counters of the search are kept (see stats.py). If
+            the stats are timed, the heuristic and the frontier are timed.
+
+        queue: string
+            The priority queue of the frontier: "heap" (PriorityQueue) or
+            "bucket" (BucketQueue)
+
+        prune_moves: int
+            The length of the longest sequences of flips that are skipped
+            when a cheaper sequence does the same (see redundant_flips()).
+            No sequences are skipped if this is 0.
         """
         self.length = len(initial_state)
+        if stats is None:
+            stats = SearchStats()
+        self.stats = stats
+        if heuristic is None:
+            heuristic = GapHeuristic()
+        if stats.timed:
+            heuristic = TimedHeuristic(heuristic, stats)
+        self.heuristic = heuristic
+        # A function called with every node that is expanded, for
+        # profiling or tracing. Nothing is called if it is None.
+        self.on_expand = None
+        self.debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        # The goal is the sorted stack. The heuristic is only used as a
+        # quick check, since some heuristics (e.g. pattern databases) can
+        # be 0 for states that are not sorted.
+        self.goal = tuple(sorted(initial_state))
+        # How much more than the optimal cost the solution may cost (as a
+        # factor). Only searches that give up optimality change it.
+        self.bound = 1
+        # The limits of the search (see Budget), or None, and whether the
+        # search stopped because it reached them
+        self.budget = None
+        self.exceeded = False
         # Keeps track of the states that have been visited
-        self.visited = []     
+        self.visited = set()
+        # The flips that are skipped after the last flips of a node (see
+        # redundant_flips()), and how many of its last flips are looked up
+        self.redundant = None
+        self.history = prune_moves - 1
+        if prune_moves > 1:
+            self.redundant = redundant_flips(self.length, prune_moves)
         # Keeps track of the order in which a given node is added
         self.order_added = 0   
         # The frontier is a priority queue
-        self.frontier = PriorityQueue()
+        self.frontier = QUEUES[queue]()
+        if stats.timed:
+            self.frontier = TimedQueue(self.frontier, stats)
 
         # First, put the starting configuration in the priority queue
-        self.root = Node(initial_state, None, self.order_added)
+        initial_state = tuple(initial_state)
+        self.root = Node(initial_state, None, self.order_added, None,
+                         self.heuristic(initial_state))
         self.frontier.put(self.root)
         self.order_added += 1
 
@@ -255,47 +907,84 @@ class astar():
         """
         Ensure that the largest number represents the plate and must be at
         the bottom, and that the input contains only consecutive integers.
+
+        Raises
+        ------
+        InvalidStackError
+            If the stack is not valid
         """
-        stack = self.root.state
-        for pancake in stack:
-            if pancake > stack[-1]:
-                print("Error: The plate (the largest number) must be at the bottom.")
-                exit()
-        if sorted(stack) != list(range(min(stack), max(stack) + 1)):
-            print("Error: The stack of pancakes should yield contain consecutive numbers when sorted.")
-            exit()
+        error = check_stack(self.root.state)
+        if error is not None:
+            raise InvalidStackError(error)
 
 
     def run(self):
+        """
+        Runs the search, and measures how long it takes. If the budget runs
+        out, the search ends without a solution and exceeded is set.
+        """
+        timer_start = timeit.default_timer()
+        if self.budget is not None:
+            self.budget.start()
+        try:
+            self.explore()
+        except BudgetExceeded:
+            self.solution = False
+            self.exceeded = True
+        self.stats.search_time += timeit.default_timer() - timer_start
+        self.collect_stats()
+
+
+    def collect_stats(self):
+        """
+        Copies the counters kept by the frontier into the stats
+        """
+        self.stats.pushes = self.frontier.pushes
+        self.stats.pops = self.frontier.pops
+        self.stats.peak_closed = max(self.stats.peak_closed, len(self.visited))
+
+
+    def explore(self):
         """
         Runs the A* search
         """
+        stats = self.stats
+        on_expand = self.on_expand
+        budget = self.budget
         while True:
             # If our frontier is empty and we haven't yet encountered a goal
             # state, that means there is no solution
             if self.frontier.empty():
                 self.solution = False
                 return
+            if budget is not None and budget.exceeded(stats, len(self.frontier.index)):
+                raise BudgetExceeded
             
             # Pop the priority queue to choose the node with the least cost
             curr_node = self.frontier.get()
 
             # Add the state to the list of states that have been visited
-            self.visited.append(curr_node.state)
+            self.visited.add(curr_node.state)
 
-            # If the heuristic function returns 0, then we are at the goal
-            if curr_node.heuristic() == 0:
+            # If the heuristic function returns 0 and the stack is sorted,
+            # then we are at the goal
+            if curr_node.forward_cost == 0 and curr_node.state == self.goal:
                 self.solution = curr_node
                 return
             
             # Add every possible node that the current node can reach to
             # the frontier.
+            if on_expand is not None:
+                on_expand(curr_node)
             self.expand_frontier(curr_node)
+            stats.expanded += 1
+            if len(self.frontier.index) > stats.peak_open:
+                stats.peak_open = len(self.frontier.index)
             
             # Print out debugging info only if the heap is not empty
-            if not self.frontier.empty():
-                logging.debug("Top of the heap is "),
-                logging.debug(self.frontier.heap[0].state)
+            if self.debug and not self.frontier.empty():
+                logging.debug("Top of the heap is %s",
+                              self.frontier.peek().state)
 
 
     def expand_frontier(self, curr_node):
@@ -306,61 +995,433 @@ class astar():
         
         We cannot have a flip depth of 1, because that's pointless. We
         cannot have a flip of depth length, since the last element is the
-        plate itself. 
+        plate itself. Flips that would move the pancakes already in place at
+        the bottom are not needed (see deepest_flip()), and the flip that
+        reached the current node would only bring back its parent, which
+        has been visited. With prune_moves, the flips that end a sequence
+        that a cheaper one can replace are skipped as well. None of these
+        children is built.
         """
-        for flip_depth in range(2, self.length):
-            child = copy.deepcopy(curr_node)
-            child.flip(flip_depth)
-            child.parent = curr_node
-            child.order_added = self.order_added
-            
-            # If the child contains a state that has not been visited,
-            # and the frontier does not already have the child's state,
-            # then add the child to the frontier
-            if (child.state not in self.visited) and (not self.frontier.has(child.state)):
-                self.frontier.put(child)
+        stats = self.stats
+        state = curr_node.state
+        last_flip = curr_node.flip_depth
+        skip = ()
+        if self.redundant is not None:
+            skip = self.redundant.get(self.last_flips(curr_node), ())
+        generated = 0
+        for flip_depth in range(2, deepest_flip(state, self.goal) + 1):
+            if flip_depth == last_flip or flip_depth in skip:
+                continue
+            generated += 1
+            child_state = flip(state, flip_depth)
             
+            # If the child contains a state that has already been visited,
+            # there is nothing to do (and no need to create a node)
+            if child_state in self.visited:
+                stats.duplicates += 1
+                self.order_added += 1
+                continue
+
+            child = Node(child_state, curr_node, self.order_added, flip_depth,
+                         self.heuristic.after_flip(state, curr_node.forward_cost,
+                                                   flip_depth, child_state))
+            if self.debug:
+                logging.debug("Flipped %s at depth %d to get %s",
+                              state, flip_depth, child_state)
+
             # If the frontier has the child's state but the child has a
             # lower cost to get to that state, replace the existing node in
             # the frontier with the child
-            elif self.frontier.has(child.state):
-                self.frontier.replace(child)
+            if self.frontier.has(child_state):
+                if not self.frontier.replace(child):
+                    stats.duplicates += 1
+
+            # Otherwise, the frontier does not already have the child's
+            # state, so add the child to the frontier
+            else:
+                self.frontier.put(child)
             
             self.order_added += 1
 
-    def print_solution(self):
+        stats.generated += generated
+        stats.pruned += self.length - 2 - generated
+
+
+    def last_flips(self, node):
+        """
+        Returns
+        -------
+        tuple
+            The last flips that reached a node, the most recent first (at
+            most as many as redundant_flips() looks up)
+        """
+        flips = []
+        while node.parent is not None and len(flips) < self.history:
+            flips.append(node.flip_depth)
+            node = node.parent
+        return tuple(flips)
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            A lower bound of the optimal cost, from what the search has
+            done so far: the least total cost in the frontier, since the
+            heuristics are consistent
         """
-        Prints result of A* search. The solution here is only the final
-        node and does not contain any information about the steps. However,
-        this node contains information about its parent and we can trace
-        back.
+        if self.frontier.empty():
+            return self.root.forward_cost
+        return max(self.root.forward_cost, self.frontier.peek().cost)
+
+
+    def solution_path(self):
+        """
+        The solution here is only the final node and does not contain any
+        information about the steps. However, this node contains
+        information about its parent and we can trace back.
+
+        Returns
+        -------
+        list
+            The nodes from the initial stack to the sorted stack, or None if
+            there is no solution
         """
         if self.solution == False:
+            return None
+        solution_steps = []
+        curr_node = self.solution
+        while curr_node != None: # Stop when we reach the start
+            solution_steps.append(curr_node)
+            curr_node = curr_node.parent
+
+        # Reverse the steps because it's backwards
+        solution_steps.reverse()
+        return solution_steps
+
+
+    def solution_flips(self):
+        """
+        Returns
+        -------
+        list
+            The depth of each flip of the solution, or None if there is no
+            solution
+        """
+        solution_steps = self.solution_path()
+        if solution_steps is None:
+            return None
+        return [node.flip_depth for node in solution_steps[1:]]
+
+
+    def print_solution(self):
+        """
+        Prints result of A* search.
+        """
+        solution_steps = self.solution_path()
+        if solution_steps is None:
             print("No solution found")
-        else:
-            solution_steps = []
-            curr_node = self.solution
-            while curr_node != None: # Stop when we reach the start
-                solution_steps.append(curr_node)
-                curr_node = curr_node.parent
-            
-            # If there is only one state in our solution, then the user input
-            # is already the solution
-            if len(solution_steps) == 1:
-                print("Your stack of pancakes is already sorted!")
-                exit()
             
-            # Reverse the steps because it's backwards
-            solution_steps.reverse()
-            
-            # Finally, print the steps to get to the solution
-            print("To sort the stack", solution_steps[0].state, "do the following:")
+        # If there is only one state in our solution, then the user input
+        # is already the solution
+        elif len(solution_steps) == 1:
+            print("Your stack of pancakes is already sorted!")
+
+        # Finally, print the steps to get to the solution
+        else:
+            print("To sort the stack", list(solution_steps[0].state), "do the following:")
             for step in range(1, len(solution_steps)):
                 print("Step", step, ": Flip the top", 
                     solution_steps[step].flip_depth,
-                    "pancakes to get", solution_steps[step].state)
+                    "pancakes to get", list(solution_steps[step].state))
+
+
+"""
+idastar Class
+-------------
+Iterative-deepening A* (IDA*). Instead of keeping a frontier, it runs a
+depth-first search that prunes every node whose total cost is above a
+threshold. If no solution is found, the threshold is raised to the
+smallest total cost that was pruned and the search starts again. Only the
+current path is kept in memory, so memory grows with the depth of the
+solution rather than with the number of nodes generated. The solution has
+the same cost as the one found by A*.
+
+A flip is its own inverse, so a flip at the same depth as the previous one
+only undoes it and is never tried. Optionally, a bounded transposition
+table remembers the cheapest backward cost with which each state was
+reached in the current iteration, so that states reached again at a
+higher cost are not searched twice.
+"""
+class idastar(astar):
+    def __init__(self, initial_state, heuristic=None, table_size=0, stats=None):
+        """
+        Creates a new instance of the IDA* search algorithm.
+
+        Args
+        ----
+        initial_state: list or tuple
+            The initial state is given by user input.
+
+        heuristic: heuristic object
+            The heuristic that guides the search (see heuristics.py).
+            Default: the gap heuristic
+
+        table_size: int
+            The largest number of states kept in the transposition table.
+            The table is not used if this is 0.
+
+        stats: SearchStats object
+            Where the counters of the search are kept
+        """
+        super().__init__(initial_state, heuristic, stats)
+        self.table_size = table_size
+        # The total cost above which nodes are pruned
+        self.threshold = self.root.total_cost()
+
+
+    def collect_stats(self):
+        """
+        The counters of IDA* are kept while it runs
+        """
+
+
+    def explore(self):
+        """
+        Runs the IDA* search
+        """
+        threshold = self.threshold
+        while True:
+            logging.debug("Searching with threshold %d", threshold)
+            self.threshold = threshold
+            self.table = {}
+            self.path = []
+            self.depth = 0
+            result = self.search(self.root.state, 0, self.root.forward_cost,
+                                 threshold, None)
+
+            # The path is collected from the goal back to the start
+            if result is True:
+                self.path.reverse()
+                self.solution = replay(self.root, self.path, self.heuristic)
+                return
+
+            # Nothing was pruned, so there is no solution
+            if result is None:
+                self.solution = False
+                return
+            threshold = result
+
+
+    def search(self, state, backward_cost, forward_cost, threshold, last_flip):
+        """
+        Depth-first search below a state.
+
+        Args
+        ----
+        state: tuple
+            The state to search from
+
+        backward_cost: int
+            The number of pancakes flipped to reach state
+
+        forward_cost: int
+            The heuristic of state
+
+        threshold: int
+            Nodes with a total cost above the threshold are pruned
+
+        last_flip: int
+            The depth of the flip that reached state
+
+        Returns
+        -------
+        True if the goal was found (self.path then holds the flips from
+        the goal back to state), otherwise the smallest total cost that was
+        pruned, or None if nothing was pruned
+        """
+        total_cost = backward_cost + forward_cost
+        if total_cost > threshold:
+            return total_cost
+        if forward_cost == 0 and state == self.goal:
+            return True
+
+        # Skip states that were already reached as cheaply in this
+        # iteration: everything below them has already been searched
+        if self.table_size:
+            seen = self.table.get(state)
+            if seen is not None and seen <= backward_cost:
+                self.stats.duplicates += 1
+                return None
+            if seen is not None or len(self.table) < self.table_size:
+                self.table[state] = backward_cost
+                if len(self.table) > self.stats.peak_closed:
+                    self.stats.peak_closed = len(self.table)
+
+        # IDA* has no frontier: it only keeps the current path, so the
+        # peak open size is the longest path that was searched
+        stats = self.stats
+        if self.budget is not None and self.budget.exceeded(stats):
+            raise BudgetExceeded
+        stats.expanded += 1
+        self.depth += 1
+        if self.depth > stats.peak_open:
+            stats.peak_open = self.depth
+        minimum = None
+        for flip_depth in range(2, self.length):
+            if flip_depth == last_flip:
+                continue
+            stats.generated += 1
+            child = flip(state, flip_depth)
+            result = self.search(child, backward_cost + flip_depth,
+                                 self.heuristic.after_flip(state, forward_cost,
+                                                           flip_depth, child),
+                                 threshold, flip_depth)
+            if result is True:
+                self.path.append(flip_depth)
+                self.depth -= 1
+                return True
+            if result is not None and (minimum is None or result < minimum):
+                minimum = result
+        self.depth -= 1
+        return minimum
+
+
+    def lower_bound(self):
+        """
+        Returns
+        -------
+        int
+            The threshold of the current iteration: every path below it was
+            searched without reaching the goal
+        """
+        return self.threshold
+
+
+# The search algorithms that can be chosen by name
+ENGINES = ["astar", "ida", "bidirectional", "vector", "hda", "weighted",
+           "anytime", "external", "compact"]
+# The cost models: a flip costs the number of pancakes flipped ("depth") or
+# 1 ("unit")
+COSTS = ["depth", "unit"]
+
+
+def make_search(engine, initial_state, heuristic=None, table_size=0,
+                stats=None, queue="heap", workers=None, weight=2,
+                weight_step=0.5, budget=None, spill_dir=None,
+                run_size=None, cost="depth", prune_moves=0):
+    """
+    Creates a search from the name of its algorithm.
+
+    Args
+    ----
+    engine: string
+        "astar", "ida", "bidirectional", "vector", "hda", "weighted",
+        "anytime", "external" or "compact"
+
+    initial_state: list or tuple
+        The stack of pancakes to sort
+
+    heuristic: heuristic object
+        The heuristic that guides the search (see heuristics.py)
+
+    table_size: int
+        The size of the transposition table of IDA*
+
+    stats: SearchStats object
+        Where the counters of the search are kept (see stats.py)
+
+    queue: string
+        The priority queue of A* and the vector engine (see QUEUES). The
+        other engines keep their own frontier.
+
+    workers: int
+        The number of worker processes of HDA*. Default: the number of
+        cores
+
+    weight, weight_step:
+        The weight of the heuristic of weighted A* and of the first search
+        of the anytime search, and how much the anytime search lowers it
+        each time (see anytime.py)
+
+    budget: Budget object
+        The limits of the search. When they are reached, the anytime
+        search keeps its best solution so far, and the other searches end
+        without a solution (see astar.run). HDA* checks the memory of the
+        main process only, and IDA* has no frontier to limit.
+
+    spill_dir, run_size:
+        Where the external search writes its files, and how many states it
+        keeps in memory (see external.py)
+
+    cost: string
+        "depth" or "unit". With unit costs, the search is a breadth-first
+        search (see breadth_first.py), from both ends if the engine is
+        "bidirectional"; the other engines only use the depth cost.
+
+    prune_moves: int
+        The length of the longest sequences of flips that A* skips when a
+        cheaper sequence does the same (see redundant_flips()), or 0
+
+    Returns
+    -------
+    An astar object (or an object of one of its subclasses)
+    """
+    if cost not in COSTS:
+        raise ValueError("Unknown cost: " + str(cost))
+    if prune_moves and (engine != "astar" or cost != "depth"):
+        raise ValueError("Only the astar engine with the depth cost skips "
+                         "redundant sequences of flips")
+    if engine == "ida" and budget is not None and budget.states is not None:
+        raise ValueError("The ida engine has no frontier to limit")
+    if cost == "unit":
+        if engine not in ("astar", "bidirectional"):
+            raise ValueError("The " + str(engine) + " engine only uses the "
+                             "depth cost")
+        from breadth_first import breadth_first
+        search = breadth_first(initial_state, stats,
+                               engine == "bidirectional")
+    elif engine == "ida":
+        search = idastar(initial_state, heuristic, table_size, stats)
+    elif engine == "bidirectional":
+        # Imported here because bidirectional.py imports this module
+        from bidirectional import bidirectional
+        search = bidirectional(initial_state, heuristic, stats)
+    elif engine == "vector":
+        # Imported here because NumPy is only needed for this engine
+        try:
+            from vectorized import vectorized
+        except ImportError:
+            raise ValueError("The vector engine needs NumPy")
+        search = vectorized(initial_state, heuristic, stats, queue)
+    elif engine == "hda":
+        from parallel import parallel
+        search = parallel(initial_state, heuristic, stats, workers)
+    elif engine == "weighted":
+        from anytime import weighted
+        search = weighted(initial_state, heuristic, stats, weight)
+    elif engine == "anytime":
+        from anytime import anytime
+        search = anytime(initial_state, heuristic, stats, weight, weight_step,
+                         budget)
+    elif engine == "external":
+        from external import RUN_SIZE, external
+        search = external(initial_state, heuristic, stats, spill_dir,
+                          run_size or RUN_SIZE)
+    elif engine == "compact":
+        from compact import compact
+        search = compact(initial_state, heuristic, stats)
+    elif engine == "astar":
+        search = astar(initial_state, heuristic, stats, queue, prune_moves)
+    else:
+        raise ValueError("Unknown engine: " + str(engine))
+    # Searches without limits skip the checks altogether
+    if budget is not None and budget.limited:
+        search.budget = budget
+    return search
+
 
-           
 def main():
     """
     Parse through command line arguments, and calls astar() methods
@@ -377,23 +1438,214 @@ def main():
                         type = int,
                         default = [4,5,1,3,2,6],
                         help = "Define a stack of pancakes to be sorted. Default: %(default)s")    
+    parser.add_argument("--heuristic",
+                        choices = HEURISTICS,
+                        default = "gap",
+                        help = "The heuristic that guides the search: the gap "
+                               "heuristic, the landmark heuristic (which "
+                               "counts the pancakes flipped), pattern "
+                               "databases, the maximum of the gap heuristic "
+                               "and pattern databases, or none (uniform-cost "
+                               "search). Default: %(default)s")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database built with "
+                               "pattern_database.py. Can be given several times")
+    parser.add_argument("--engine",
+                        choices = ENGINES,
+                        default = "astar",
+                        help = "The search algorithm: A*, iterative-deepening "
+                               "A* which uses much less memory, or a "
+                               "bidirectional (MM) search from both the stack "
+                               "and the sorted stack, or A* that expands "
+                               "nodes in batches with NumPy, A* on several "
+                               "processes (HDA*), weighted A* which finds a "
+                               "solution of cost at most --weight times the "
+                               "optimal cost, or an anytime search (ARA*) "
+                               "which improves its solution until it is "
+                               "optimal or the budget runs out, or A* with "
+                               "its frontier and visited states on disk, or "
+                               "A* that keeps packed integers instead of "
+                               "nodes. Default: %(default)s")
+    parser.add_argument("--cost",
+                        choices = COSTS,
+                        default = "depth",
+                        help = "What a flip costs: the number of pancakes "
+                               "flipped, or 1 (the classic pancake problem, "
+                               "solved by a breadth-first search, from both "
+                               "ends with --engine bidirectional). "
+                               "Default: %(default)s")
+    parser.add_argument("--weight",
+                        type = float,
+                        default = 2,
+                        help = "The weight of the heuristic of the weighted "
+                               "and anytime engines. Default: %(default)s")
+    parser.add_argument("--weight-step",
+                        type = float,
+                        default = 0.5,
+                        help = "How much the anytime engine lowers the weight "
+                               "after each solution. Default: %(default)s")
+    parser.add_argument("--deadline",
+                        type = float,
+                        metavar = "SECONDS",
+                        help = "How long the search may run. The anytime "
+                               "engine then keeps its best solution, and the "
+                               "other engines stop with the lower bound of the "
+                               "cost they reached")
+    parser.add_argument("--max-expansions",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of nodes after which the search "
+                               "stops, as with --deadline")
+    parser.add_argument("--max-frontier",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of states in the frontier after "
+                               "which the search stops, as with --deadline")
+    parser.add_argument("--max-memory",
+                        type = float,
+                        metavar = "MIB",
+                        help = "The memory used by the process after which the "
+                               "search stops, as with --deadline")
+    parser.add_argument("--complete",
+                        action = "store_true",
+                        help = "When the search stops early, sort the stack "
+                               "greedily instead of giving no solution")
+    parser.add_argument("--spill-dir",
+                        metavar = "DIR",
+                        help = "Where the external engine writes its files. "
+                               "Default: the temporary directory")
+    parser.add_argument("--run-size",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of states the external engine "
+                               "keeps in memory before it writes them to disk")
+    parser.add_argument("--workers",
+                        type = int,
+                        default = None,
+                        help = "The number of worker processes of HDA*. "
+                               "Default: the number of cores")
+    parser.add_argument("--queue",
+                        choices = list(QUEUES),
+                        default = "heap",
+                        help = "The priority queue of the frontier of A* and "
+                               "the vector engine: a binary heap, or one bucket "
+                               "per total cost. Default: %(default)s")
+    parser.add_argument("--prune-moves",
+                        type = int,
+                        default = 0,
+                        metavar = "L",
+                        help = "Make A* skip the flips that end a sequence of "
+                               "at most L flips that a cheaper sequence can "
+                               "replace (0 disables it). Default: %(default)s")
+    parser.add_argument("--table-size",
+                        type = int,
+                        default = 0,
+                        help = "The largest number of states kept in the "
+                               "transposition table of IDA* (0 disables it). "
+                               "Default: %(default)s")
+    parser.add_argument("--cache",
+                        metavar = "FILE",
+                        help = "A sqlite file where solutions are stored, so "
+                               "that equivalent stacks are only searched once")
+    parser.add_argument("--distances",
+                        metavar = "FILE",
+                        help = "A table of the optimal cost of every stack of "
+                               "a given size, built with distance_table.py. "
+                               "Stacks of that size are solved from the table "
+                               "without searching")
+    parser.add_argument("--stats",
+                        action = "store_true",
+                        help = "Print the counters of the search and the time "
+                               "spent in the heuristic and the frontier")
+    parser.add_argument("--profile",
+                        metavar = "FILE",
+                        help = "Run the search under cProfile, save the "
+                               "profile to a file and print the slowest calls")
+    parser.add_argument("--tracemalloc",
+                        action = "store_true",
+                        help = "Trace the memory allocated by the search and "
+                               "print its peak")
     args = parser.parse_args()
     
     # Setup Debugging
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
+    # Imported here because solver.py imports this module
+    from solver import print_result, solve
+
+    # Load the distance table and the solution cache
+    distances = None
+    cache = None
+    try:
+        if args.distances:
+            # Imported here because the distance table is optional
+            from distance_table import DistanceTable
+            distances = DistanceTable(args.distances)
+        if args.cache:
+            # Imported here because the cache is optional
+            from solution_cache import SolutionCache
+            cache = SolutionCache(args.cache)
+    except (ValueError, OSError) as error:
+        print("Error:", error)
+        exit()
+
+    try:
+        budget = Budget(args.deadline, args.max_expansions, args.max_frontier,
+                        args.max_memory)
+    except ValueError as error:
+        print("Error:", error)
+        exit()
+    on_solution = None
+    if args.engine == "anytime":
+        # Report every solution as soon as it is found
+        on_solution = lambda solution, bound: print(
+            "Found a solution of cost", solution.backward_cost,
+            "(at most", round(bound, 3), "times the optimal cost)")
+    options = dict(engine=args.engine, heuristic=args.heuristic,
+                   budget=budget, cost=args.cost, pdb_paths=args.pdb,
+                   distances=distances, cache=cache, timed=args.stats,
+                   on_solution=on_solution, complete=args.complete,
+                   queue=args.queue, table_size=args.table_size,
+                   workers=args.workers, weight=args.weight,
+                   weight_step=args.weight_step, spill_dir=args.spill_dir,
+                   run_size=args.run_size, prune_moves=args.prune_moves)
 
-    # Finally, instantiate astar() object and run search
-    AStar = astar(args.stack)
-    AStar.verify()
+    run = solve
+    if args.profile:
+        # Imported here because profiling is optional
+        import cProfile
+        profile = cProfile.Profile()
+        run = lambda stack, **options: profile.runcall(solve, stack, **options)
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
 
-    timer_start = timeit.default_timer()
-    AStar.run()
-    timer_stop = timeit.default_timer()
+    # Finally, solve the stack
+    try:
+        result = run(args.stack, **options)
+    except ValueError as error:
+        print("Error:", error)
+        exit()
+    finally:
+        if cache is not None:
+            cache.close()
 
-    AStar.print_solution()
-    print("Execution Time:", round(timer_stop - timer_start, 2), "s") 
+    print_result(result)
+    print("Execution Time:", round(result.time, 2), "s")
+    if args.stats:
+        print(result.stats)
+    if args.tracemalloc:
+        print("Peak Traced Memory:",
+              round(tracemalloc.get_traced_memory()[1] / 1024), "KiB")
+        tracemalloc.stop()
+    if args.profile:
+        import pstats
+        profile.dump_stats(args.profile)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
     
 
 if __name__ == '__main__':
@@ -0,0 +1,453 @@
+"""
+Parallel Search (HDA*)
+----------------------
+Runs A* on several processes with Hash Distributed A* ("Best-First
+Heuristic Search for Multicore Machines", Kishimoto, Fukunaga and Botea).
+Every state has an owner: the worker whose number is the hash of the state
+modulo the number of workers. Each worker keeps the frontier and the
+visited states of the states it owns, and expands its own best node
+without waiting for the others. Children owned by another worker are
+buffered and sent to that worker in batches through its queue. Each
+message carries the state, its backward cost, its heuristic and the flips
+that led to it from the initial stack, so no parent pointers cross
+processes and the solution is rebuilt from the flips.
+
+Since workers do not expand nodes in the global order of total cost, a
+state can first be reached by a path that is not the cheapest. When a
+cheaper path to a visited state arrives, the state is reopened.
+
+Whenever a worker expands the sorted stack, its cost becomes the
+incumbent, shared by all the workers, if it is cheaper. Nodes whose total
+cost is not lower than the incumbent are pruned, since the heuristics
+never overestimate. The search is over once no worker has a node left
+under the incumbent and no message is on its way. Each worker raises a
+flag when it is idle, and counts the batches it sends and receives. The
+coordinator ends the search when every worker is idle, as many batches
+were received as were sent, and all of this is unchanged on two readings
+in a row (so nothing happened between them). The incumbent is then
+optimal: every node that could lead to a cheaper solution was expanded.
+
+Each worker also publishes how many nodes it has expanded and how many
+states its frontier holds. With a budget, the worker that finds that all
+the workers together have gone over its limits ends the search, so each
+worker may expand up to EXPANSIONS_PER_ROUND nodes more than the limit.
+The coordinator checks the deadline and the memory.
+"""
+
+import heapq                # Heaps for Priority Queue
+import multiprocessing      # Worker Processes
+import os                   # Number of Cores
+import queue                # Empty Queue Exception
+import time                 # Waiting for the Workers
+
+from pancake import BudgetExceeded, astar, flip, replay
+from stats import SearchStats, TimedHeuristic
+
+# The number of children sent to another worker in one message
+BATCH_SIZE = 64
+# The number of nodes a worker expands before it reads its messages
+EXPANSIONS_PER_ROUND = 64
+# How long an idle worker (or the coordinator) waits between checks, in s
+POLL_INTERVAL = 0.002
+
+
+"""
+Worker Class
+------------
+The part of the search owned by one process.
+"""
+class Worker():
+    def __init__(self, number, initial_state, heuristic, timed, shared):
+        """
+        Args
+        ----
+        number: int
+            The number of this worker, from 0
+
+        initial_state: tuple
+            The stack of pancakes to sort
+
+        heuristic: heuristic object
+            The heuristic that guides the search (see heuristics.py)
+
+        timed: boolean
+            Whether the heuristic is timed (see stats.py)
+
+        shared: dict
+            The queues, flags and counters shared by the workers (see
+            parallel.explore)
+        """
+        self.number = number
+        self.stats = SearchStats(timed)
+        if timed:
+            heuristic = TimedHeuristic(heuristic, self.stats)
+        self.heuristic = heuristic
+        self.length = len(initial_state)
+        self.goal = tuple(sorted(initial_state))
+        self.inboxes = shared["inboxes"]
+        self.inbox = self.inboxes[number]
+        self.results = shared["results"]
+        self.incumbent = shared["incumbent"]
+        self.idle = shared["idle"]
+        self.sent = shared["sent"]
+        self.received = shared["received"]
+        self.done = shared["done"]
+        self.expanded = shared["expanded"]
+        self.open = shared["open"]
+        self.limits = shared["limits"]
+        self.exceeded = shared["exceeded"]
+        self.workers = len(self.inboxes)
+        self.outboxes = [[] for _ in range(self.workers)]
+
+        # The frontier is a heap of (total cost, -backward cost, order
+        # added, state). best holds the backward cost, heuristic and flips
+        # of every state in the frontier; entries of the heap that do not
+        # match it are stale.
+        self.heap = []
+        self.best = {}
+        self.closed = {}
+        self.order_added = 0
+
+
+    def run(self):
+        """
+        Expands nodes and exchanges children until the coordinator ends the
+        search, then sends the counters of this worker to the coordinator
+        """
+        while not self.done.is_set():
+            self.receive(block=False)
+            progress = self.expand_round()
+            self.check_limits()
+            if progress:
+                self.flush()
+                continue
+
+            # Nothing left under the incumbent: send what is buffered, then
+            # wait for more work
+            self.flush()
+            self.idle[self.number] = 1
+            self.receive(block=True)
+
+        # When the budget ends the search, children may still be waiting
+        # in the queues of workers that have stopped. They are no longer
+        # needed, and this process must not wait for them to be read
+        # before it exits.
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()
+        self.stats.peak_closed = len(self.closed)
+        self.results.put(("stats", self.stats.as_dict()))
+
+
+    def check_limits(self):
+        """
+        Publishes the counters of this worker, and ends the search if the
+        workers together have expanded more nodes or hold more states in
+        their frontiers than the budget allows
+        """
+        self.expanded[self.number] = self.stats.expanded
+        self.open[self.number] = len(self.best)
+        expansions, states = self.limits
+        if ((expansions is not None and sum(self.expanded) >= expansions)
+                or (states is not None and sum(self.open) > states)):
+            self.exceeded.set()
+            self.done.set()
+
+
+    def receive(self, block):
+        """
+        Adds the children sent by the other workers to the frontier.
+
+        Args
+        ----
+        block: boolean
+            Whether to wait a little for the first message
+        """
+        while True:
+            try:
+                if block:
+                    batch = self.inbox.get(timeout=POLL_INTERVAL)
+                    block = False
+                else:
+                    batch = self.inbox.get_nowait()
+            except queue.Empty:
+                return
+            self.idle[self.number] = 0
+            for state, backward_cost, forward_cost, flips in batch:
+                self.add(state, backward_cost, forward_cost, flips)
+            self.received[self.number] += 1
+
+
+    def add(self, state, backward_cost, forward_cost, flips):
+        """
+        Adds a node owned by this worker to the frontier, unless its state
+        was already reached as cheaply.
+        """
+        stats = self.stats
+        closed_cost = self.closed.get(state)
+        if closed_cost is not None:
+            if closed_cost <= backward_cost:
+                stats.duplicates += 1
+                return
+            del self.closed[state]
+            stats.reopened += 1
+        known = self.best.get(state)
+        if known is not None and known[0] <= backward_cost:
+            stats.duplicates += 1
+            return
+        self.best[state] = (backward_cost, forward_cost, flips)
+        heapq.heappush(self.heap, (backward_cost + forward_cost,
+                                   -backward_cost, self.order_added, state))
+        self.order_added += 1
+        stats.pushes += 1
+        if len(self.best) > stats.peak_open:
+            stats.peak_open = len(self.best)
+
+
+    def expand_round(self):
+        """
+        Expands up to EXPANSIONS_PER_ROUND nodes whose total cost is lower
+        than the incumbent.
+
+        Returns
+        -------
+        boolean
+            False if there was no such node
+        """
+        stats = self.stats
+        heuristic = self.heuristic
+        incumbent = self.incumbent.value
+        expanded = 0
+        while self.heap and expanded < EXPANSIONS_PER_ROUND:
+            cost, negative_backward_cost, _, state = self.heap[0]
+            if incumbent >= 0 and cost >= incumbent:
+                break
+            heapq.heappop(self.heap)
+            stats.pops += 1
+            entry = self.best.get(state)
+            if entry is None or entry[0] != -negative_backward_cost:
+                continue
+            backward_cost, forward_cost, flips = entry
+            del self.best[state]
+            self.closed[state] = backward_cost
+
+            if forward_cost == 0 and state == self.goal:
+                incumbent = self.improve(backward_cost, flips)
+                continue
+
+            expanded += 1
+            stats.expanded += 1
+            for flip_depth in range(2, self.length):
+                child = flip(state, flip_depth)
+                child_backward_cost = backward_cost + flip_depth
+                child_forward_cost = heuristic.after_flip(state, forward_cost,
+                                                          flip_depth, child)
+                stats.generated += 1
+                if (incumbent >= 0 and child_backward_cost + child_forward_cost
+                        >= incumbent):
+                    continue
+                child_flips = flips + (flip_depth,)
+                owner = hash(child) % self.workers
+                if owner == self.number:
+                    self.add(child, child_backward_cost, child_forward_cost,
+                             child_flips)
+                else:
+                    outbox = self.outboxes[owner]
+                    outbox.append((child, child_backward_cost,
+                                   child_forward_cost, child_flips))
+                    if len(outbox) >= BATCH_SIZE:
+                        self.send(owner)
+        return expanded > 0
+
+
+    def improve(self, cost, flips):
+        """
+        Makes a solution the incumbent if it is cheaper than the incumbent.
+
+        Returns
+        -------
+        int
+            The incumbent
+        """
+        with self.incumbent.get_lock():
+            if self.incumbent.value < 0 or cost < self.incumbent.value:
+                self.incumbent.value = cost
+                self.results.put(("solution", cost, flips))
+            return self.incumbent.value
+
+
+    def send(self, owner):
+        """
+        Sends the buffered children of a worker to it
+        """
+        self.sent[self.number] += 1
+        self.inboxes[owner].put(self.outboxes[owner])
+        self.outboxes[owner] = []
+
+
+    def flush(self):
+        """
+        Sends every buffered child
+        """
+        for owner in range(self.workers):
+            if self.outboxes[owner]:
+                self.send(owner)
+
+
+def start_worker(number, initial_state, heuristic, timed, shared):
+    """
+    The function that runs in each worker process
+    """
+    Worker(number, initial_state, heuristic, timed, shared).run()
+
+
+"""
+parallel Class
+--------------
+Runs HDA* on a number of worker processes, and joins their results so
+that print_solution() works as for A*.
+"""
+class parallel(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None,
+                 workers=None):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats:
+            See astar
+
+        workers: int
+            The number of worker processes. Default: the number of cores
+        """
+        super().__init__(initial_state, heuristic, stats)
+        self.workers = workers or os.cpu_count() or 1
+
+
+    def collect_stats(self):
+        """
+        The counters were added up from the workers by explore()
+        """
+
+
+    def explore(self):
+        """
+        Starts the workers, waits until the search is over, and collects
+        the best solution and the counters of the workers
+        """
+        heuristic = self.heuristic
+        if isinstance(heuristic, TimedHeuristic):
+            heuristic = heuristic.heuristic
+        workers = self.workers
+        budget = self.budget
+        shared = {
+            "inboxes": [multiprocessing.Queue() for _ in range(workers)],
+            "results": multiprocessing.Queue(),
+            "incumbent": multiprocessing.Value("q", -1),
+            "idle": multiprocessing.Array("b", workers, lock=False),
+            # The coordinator counts as a sender, for the initial stack
+            "sent": multiprocessing.Array("q", workers + 1, lock=False),
+            "received": multiprocessing.Array("q", workers, lock=False),
+            "done": multiprocessing.Event(),
+            # The nodes expanded and the states in the frontier of each
+            # worker, and the limits of their sums
+            "expanded": multiprocessing.Array("q", workers, lock=False),
+            "open": multiprocessing.Array("q", workers, lock=False),
+            "limits": (None, None) if budget is None
+                      else (budget.expansions, budget.states),
+            "exceeded": multiprocessing.Event(),
+        }
+        processes = [multiprocessing.Process(
+                         target=start_worker,
+                         args=(number, self.root.state, heuristic,
+                               self.stats.timed, shared))
+                     for number in range(workers)]
+        for process in processes:
+            process.start()
+
+        root = self.root
+        shared["sent"][workers] += 1
+        shared["inboxes"][hash(root.state) % workers].put(
+            [(root.state, 0, root.forward_cost, ())])
+
+        best = None
+        previous = None
+        exceeded = False
+        # The number of workers that sent their counters. A worker that
+        # ends the search because of the budget sends them at once, so
+        # they can arrive while the coordinator is still polling.
+        self.finished = 0
+        while True:
+            time.sleep(POLL_INTERVAL)
+            best = self.read_results(shared["results"], best)
+            # The workers check the expansions and the frontier, so only
+            # the clock and the memory are checked here
+            if budget is not None and (shared["exceeded"].is_set()
+                                       or budget.expired()):
+                exceeded = True
+                break
+            snapshot = (list(shared["idle"]), list(shared["sent"]),
+                        list(shared["received"]))
+            if (all(snapshot[0]) and sum(snapshot[1]) == sum(snapshot[2])
+                    and snapshot == previous):
+                break
+            previous = snapshot
+        shared["done"].set()
+
+        # Each worker sends its counters before it stops
+        while self.finished < workers:
+            best = self.read_result(shared["results"].get(), best)
+        for process in processes:
+            process.join()
+
+        if exceeded:
+            raise BudgetExceeded
+        if best is None:
+            self.solution = False
+        else:
+            self.solution = replay(self.root, list(best[1]), self.heuristic)
+
+
+    def read_results(self, results, best):
+        """
+        Reads the solutions and counters sent so far without waiting.
+
+        Returns
+        -------
+        (int, tuple)
+            The cost and the flips of the best solution, or None
+        """
+        while True:
+            try:
+                message = results.get_nowait()
+            except queue.Empty:
+                return best
+            best = self.read_result(message, best)
+
+
+    def read_result(self, message, best):
+        """
+        Keeps the cheapest of a solution sent by a worker and the best
+        solution so far, or adds the counters sent by a worker that
+        stopped
+        """
+        if message[0] == "stats":
+            self.add_stats(message[1])
+            self.finished += 1
+            return best
+        _, cost, flips = message
+        if best is None or cost < best[0]:
+            return (cost, flips)
+        return best
+
+
+    def add_stats(self, worker_stats):
+        """
+        Adds the counters of a worker to the counters of the search. The
+        peak sizes are added too, which is an upper bound of the peak of
+        the whole search.
+        """
+        stats = self.stats
+        for name in ["expanded", "generated", "duplicates", "reopened",
+                     "pushes", "pops", "peak_open", "peak_closed"]:
+            setattr(stats, name, getattr(stats, name) + worker_stats[name])
+        if stats.timed:
+            stats.heuristic_time += worker_stats["heuristic_time"]
@@ -0,0 +1,282 @@
+"""
+Pattern Databases
+-----------------
+A pattern database (PDB) abstracts a stack of pancakes onto a subset of
+tracked pancakes (the pattern): only the positions of the tracked pancakes
+are kept and every other pancake becomes indistinguishable. Flipping works
+the same way in the abstract space and costs the same number of pancakes,
+so the cheapest way to sort an abstract stack never costs more than the
+cheapest way to sort the real one. The cost of every abstract stack is
+computed once, offline, by a Dijkstra search backwards from the sorted
+stack (a flip is its own inverse, so searching backwards is the same as
+searching forwards), and stored in a compact binary file.
+
+Pancakes are numbered 1 to size - 1 and the plate is number size, where
+size is the length of the stack including the plate. Stacks that use
+other consecutive numbers are shifted so that the plate is number size.
+
+An abstract stack is stored as the positions of the tracked pancakes (the
+plate never moves, so the positions go from 0 to size - 2). The positions
+are turned into an index into the table by ranking them as a partial
+permutation, so that the table has no holes.
+
+File Format
+-----------
+The file starts with a header: the magic bytes b"PDB1", the size of the
+stack and the number of tracked pancakes, followed by the tracked
+pancakes. Then comes the table of costs, one unsigned 16-bit integer per
+abstract stack. The file is loaded with mmap, so the table is shared
+between processes and only the pages that are used are read from disk.
+"""
+
+import argparse             # For Parsing Arguments
+import array                # Compact Tables
+import heapq                # Heaps for Dijkstra
+import mmap                 # Memory-mapped Tables
+import struct               # Binary File Header
+import timeit               # Timing
+
+MAGIC = b"PDB1"
+HEADER = struct.Struct("<4sHH")
+UNKNOWN = 0xFFFF
+
+
+def table_size(positions, tracked):
+    """
+    Args
+    ----
+    positions: int
+        The number of positions a tracked pancake can be in
+
+    tracked: int
+        The number of tracked pancakes
+
+    Returns
+    -------
+    int
+        The number of ways to place the tracked pancakes
+    """
+    size = 1
+    for i in range(tracked):
+        size *= positions - i
+    return size
+
+
+def rank(places, positions):
+    """
+    Turns the positions of the tracked pancakes into an index. Each
+    position is replaced by its index among the positions that are still
+    free, and those indices are read as a mixed-radix number.
+
+    Args
+    ----
+    places: list
+        The position of each tracked pancake
+
+    positions: int
+        The number of positions a tracked pancake can be in
+
+    Returns
+    -------
+    int
+        The index of the abstract stack in the table
+    """
+    index = 0
+    for i, place in enumerate(places):
+        digit = place
+        for other in places[:i]:
+            if other < place:
+                digit -= 1
+        index = index * (positions - i) + digit
+    return index
+
+
+def unrank(index, positions, tracked):
+    """
+    The inverse of rank().
+
+    Args
+    ----
+    index: int
+        The index of the abstract stack in the table
+
+    positions: int
+        The number of positions a tracked pancake can be in
+
+    tracked: int
+        The number of tracked pancakes
+
+    Returns
+    -------
+    places: list
+        The position of each tracked pancake
+    """
+    digits = []
+    for i in reversed(range(tracked)):
+        index, digit = divmod(index, positions - i)
+        digits.append(digit)
+    free = list(range(positions))
+    return [free.pop(digit) for digit in reversed(digits)]
+
+
+def build(size, pattern):
+    """
+    Computes the cost of sorting every abstract stack with a Dijkstra
+    search from the sorted abstract stack.
+
+    Args
+    ----
+    size: int
+        The length of the stack, including the plate
+
+    pattern: list
+        The tracked pancakes (numbers from 1 to size - 1)
+
+    Returns
+    -------
+    costs: array
+        The cost of each abstract stack, indexed by rank()
+    """
+    positions = size - 1
+    tracked = len(pattern)
+    costs = array.array("H", [UNKNOWN]) * table_size(positions, tracked)
+
+    # In the sorted stack, pancake p is at position p - 1
+    goal = rank([pancake - 1 for pancake in pattern], positions)
+    costs[goal] = 0
+    frontier = [(0, goal)]
+    while frontier:
+        cost, index = heapq.heappop(frontier)
+        if cost > costs[index]:
+            continue
+        places = unrank(index, positions, tracked)
+        for flip_depth in range(2, size):
+            # Flipping the top flip_depth pancakes moves the pancake at
+            # position p to position flip_depth - 1 - p
+            flipped = [flip_depth - 1 - place if place < flip_depth else place
+                       for place in places]
+            if flipped == places:
+                continue
+            child = rank(flipped, positions)
+            if cost + flip_depth < costs[child]:
+                costs[child] = cost + flip_depth
+                heapq.heappush(frontier, (cost + flip_depth, child))
+    return costs
+
+
+def save(path, size, pattern, costs):
+    """
+    Writes a pattern database to a file (see File Format above).
+    """
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, size, len(pattern)))
+        f.write(array.array("H", pattern).tobytes())
+        f.write(costs.tobytes())
+
+
+"""
+PatternDatabase Class
+---------------------
+A pattern database loaded from a file, used as a heuristic. Calling it on
+a state gives the cost of the abstract stack of that state.
+"""
+class PatternDatabase():
+    def __init__(self, path):
+        """
+        Loads the pattern database stored at path with mmap.
+
+        Args
+        ----
+        path: string
+            The file written by save()
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, tracked = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(path + " is not a pattern database")
+        start = HEADER.size
+        stop = start + 2 * tracked
+        self.pattern = list(memoryview(self.data)[start:stop].cast("H"))
+        self.table = memoryview(self.data)[stop:].cast("H")
+        self.positions = self.size - 1
+
+        # slot[p] is the index of pancake p in the pattern, or -1 if
+        # pancake p is not tracked
+        self.slot = [-1] * (self.size + 1)
+        for i, pancake in enumerate(self.pattern):
+            self.slot[pancake] = i
+
+
+    def __call__(self, state):
+        """
+        Args
+        ----
+        state: tuple
+            An arrangement of the stack of pancakes, with size pancakes
+            (including the plate)
+
+        Returns
+        -------
+        integer
+            The cost of sorting the abstract stack of state
+        """
+        # Shift the numbers so that the plate is number size
+        offset = state[-1] - self.size
+        slot = self.slot
+        places = [0] * len(self.pattern)
+        for position, pancake in enumerate(state):
+            i = slot[pancake - offset]
+            if i >= 0:
+                places[i] = position
+        return self.table[rank(places, self.positions)]
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        """
+        The cost of the abstract stack is looked up again for the flipped
+        state.
+        """
+        return self(flipped)
+
+
+def main():
+    """
+    Parse through command line arguments, and build a pattern database
+    """
+    parser = argparse.ArgumentParser(
+        description="Build a pattern database for stacks of a given size")
+    parser.add_argument(dest = "size",
+                        type = int,
+                        help = "The length of the stack, including the plate")
+    parser.add_argument("-p", "--pattern",
+                        nargs = "+",
+                        type = int,
+                        help = "The tracked pancakes. Default: the largest "
+                               "(up to 7) pancakes")
+    parser.add_argument("-o", "--output",
+                        required = True,
+                        help = "The file to write the pattern database to")
+    args = parser.parse_args()
+
+    pattern = args.pattern
+    if pattern is None:
+        pattern = list(range(max(1, args.size - 7), args.size))
+    if (len(set(pattern)) != len(pattern) or
+            any(pancake < 1 or pancake >= args.size for pancake in pattern)):
+        parser.error("The pattern must contain distinct pancakes from 1 to "
+                     + str(args.size - 1))
+
+    timer_start = timeit.default_timer()
+    costs = build(args.size, pattern)
+    save(args.output, args.size, pattern, costs)
+    timer_stop = timeit.default_timer()
+
+    print("Pattern database with", len(costs), "entries written to",
+          args.output)
+    print("Execution Time:", round(timer_stop - timer_start, 2), "s")
+
+
+if __name__ == '__main__':
+    main()
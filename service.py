@@ -0,0 +1,399 @@
+"""
+Solver Service
+--------------
+A long-running process that solves stacks sent over HTTP, so that a
+caller does not pay for starting Python, parsing arguments and loading
+the heuristic on every stack. It listens on a Unix socket or on a local
+TCP port, and answers:
+
+* POST /solve with a JSON object such as {"stack": [3, 1, 2, 4]}. The
+  answer is the same JSON object as a result of batch.py (without the
+  line number): the flips, the cost, the number of nodes expanded and the
+  time spent, or an error message. With --deadline and the other limits,
+  no request searches for longer than allowed: a search that runs out of
+  budget answers with the lower bound of the cost it reached (and with a
+  greedy solution if --complete is given).
+* GET /metrics with the counters of the service.
+
+The stacks are solved by a pool of worker processes started once, with
+the worker functions of batch.py, so each worker keeps its heuristics,
+its distance tables and its solution cache in memory between requests.
+When the same stack is asked for again while it is being solved, the
+request waits for the same result instead of solving it twice.
+"""
+
+import argparse             # For Parsing Arguments
+import asyncio              # Event Loop
+import concurrent.futures   # Process Pool
+import json                 # Request and Response Format
+import os                   # Number of Cores
+import timeit               # Timing
+
+from batch import check_distance_tables, solve, start_worker
+from heuristics import HEURISTICS
+from pancake import ENGINES, QUEUES, Budget, check_stack
+
+# The largest request body that is read, in bytes
+MAX_BODY = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+def without_line(result):
+    """
+    Returns
+    -------
+    dict
+        A copy of a result of batch.solve without its line number
+    """
+    result = dict(result)
+    del result["line"]
+    return result
+
+
+def parse_length(value):
+    """
+    Args
+    ----
+    value: string
+        The Content-Length header, or None if there is none
+
+    Returns
+    -------
+    int
+        The length of the body, or None if the header is not a
+        non-negative integer
+    """
+    if not value:
+        return 0
+    try:
+        length = int(value)
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+"""
+ServiceMetrics Class
+--------------------
+The counters of the service, sent by GET /metrics.
+"""
+class ServiceMetrics():
+    def __init__(self):
+        """
+        Sets every counter to 0
+        """
+        self.requests = 0
+        self.solved = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.exceeded = 0
+        self.in_flight = 0
+        self.solve_time = 0.0
+        self.started = timeit.default_timer()
+
+
+    def as_dict(self):
+        """
+        Returns
+        -------
+        dict
+            The counters, the uptime and the mean time to solve a stack
+        """
+        return {
+            "requests": self.requests,
+            "solved": self.solved,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "exceeded": self.exceeded,
+            "in_flight": self.in_flight,
+            "mean_solve_time": self.solve_time / max(1, self.solved),
+            "uptime": timeit.default_timer() - self.started,
+        }
+
+
+"""
+SolverService Class
+-------------------
+Reads HTTP requests from the connections and sends the stacks to the
+worker pool.
+"""
+class SolverService():
+    def __init__(self, pool):
+        """
+        Args
+        ----
+        pool: concurrent.futures.Executor
+            The workers, started with batch.start_worker
+        """
+        self.pool = pool
+        self.metrics = ServiceMetrics()
+        # The stacks being solved, and the future of their result
+        self.pending = {}
+
+
+    async def solve(self, stack):
+        """
+        Solves a stack in the pool, or waits for the same stack if it is
+        already being solved.
+
+        Returns
+        -------
+        dict
+            The result of batch.solve, without the line number
+        """
+        key = tuple(stack)
+        future = self.pending.get(key)
+        if future is not None:
+            self.metrics.coalesced += 1
+            return without_line(await asyncio.shield(future))
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, solve, 0, stack)
+        self.pending[key] = future
+        self.metrics.in_flight += 1
+        timer_start = timeit.default_timer()
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self.pending[key]
+            self.metrics.in_flight -= 1
+        self.metrics.solved += 1
+        self.metrics.solve_time += timeit.default_timer() - timer_start
+        return without_line(result)
+
+
+    async def handle(self, method, path, body):
+        """
+        Answers one request.
+
+        Returns
+        -------
+        (int, dict)
+            The status code and the JSON response
+        """
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, self.metrics.as_dict()
+        if path != "/solve":
+            return 404, {"error": "Unknown path: " + path}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        try:
+            stack = json.loads(body)["stack"]
+            if (not isinstance(stack, list) or
+                    not all(type(pancake) is int for pancake in stack)):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self.metrics.errors += 1
+            return 400, {"error": "Send a JSON object with a list of "
+                                  "integers as its stack"}
+        error = check_stack(stack)
+        if error is not None:
+            self.metrics.errors += 1
+            return 400, {"stack": stack, "error": error}
+        result = await self.solve(stack)
+        if "error" in result:
+            self.metrics.errors += 1
+        if result.get("budget_exceeded"):
+            self.metrics.exceeded += 1
+        return 200, result
+
+
+    async def serve_connection(self, reader, writer):
+        """
+        Reads the requests of a connection one after the other, until it
+        is closed.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode().split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Bad request"},
+                                       False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version == "HTTP/1.1")
+
+                length = parse_length(headers.get("content-length"))
+                if length is None:
+                    self.metrics.requests += 1
+                    self.metrics.errors += 1
+                    await self.respond(writer, 400,
+                                       {"error": "Bad Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    self.metrics.requests += 1
+                    self.metrics.errors += 1
+                    await self.respond(writer, 413, {"error": "Too large"},
+                                       False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                self.metrics.requests += 1
+                status, response = await self.handle(method, path, body)
+                await self.respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            # The connection was closed or the request cannot be read
+            pass
+        finally:
+            writer.close()
+
+
+    async def respond(self, writer, status, response, keep_alive):
+        """
+        Writes a JSON response
+        """
+        body = json.dumps(response).encode()
+        head = ("HTTP/1.1 %d %s\r\n"
+                "Content-Type: application/json\r\n"
+                "Content-Length: %d\r\n"
+                "Connection: %s\r\n\r\n"
+                % (status, REASONS[status], len(body),
+                   "keep-alive" if keep_alive else "close"))
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+
+async def serve(service, socket_path=None, host="127.0.0.1", port=8000):
+    """
+    Listens on a Unix socket (if socket_path is given) or on a TCP port,
+    until the process is stopped
+    """
+    if socket_path is not None:
+        server = await asyncio.start_unix_server(service.serve_connection,
+                                                 path=socket_path)
+        print("Listening on", socket_path)
+    else:
+        server = await asyncio.start_server(service.serve_connection,
+                                            host, port)
+        print("Listening on http://%s:%d" % (host, port))
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    """
+    Parse through command line arguments, start the workers and serve
+    requests
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve stacks of pancakes sent over HTTP, keeping the "
+                    "workers and their tables warm between requests")
+    parser.add_argument("--socket",
+                        metavar = "PATH",
+                        help = "Listen on a Unix socket instead of a TCP port")
+    parser.add_argument("--host",
+                        default = "127.0.0.1",
+                        help = "The address to listen on. Default: %(default)s")
+    parser.add_argument("--port",
+                        type = int,
+                        default = 8000,
+                        help = "The TCP port to listen on. Default: %(default)s")
+    parser.add_argument("-w", "--workers",
+                        type = int,
+                        default = None,
+                        help = "The number of worker processes. Default: the "
+                               "number of cores")
+    parser.add_argument("--engine",
+                        choices = ENGINES,
+                        default = "astar",
+                        help = "The search algorithm. Default: %(default)s")
+    parser.add_argument("--queue",
+                        choices = list(QUEUES),
+                        default = "heap",
+                        help = "The priority queue of A* and the vector "
+                               "engine. Default: %(default)s")
+    parser.add_argument("--heuristic",
+                        choices = HEURISTICS,
+                        default = "gap",
+                        help = "The heuristic that guides the search. "
+                               "Default: %(default)s")
+    parser.add_argument("--pdb",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A pattern database built with "
+                               "pattern_database.py. Can be given several times")
+    parser.add_argument("--table-size",
+                        type = int,
+                        default = 0,
+                        help = "The size of the transposition table of IDA*. "
+                               "Default: %(default)s")
+    parser.add_argument("--cache",
+                        metavar = "FILE",
+                        help = "A sqlite file where solutions are stored, so "
+                               "that equivalent stacks are only searched once")
+    parser.add_argument("--distances",
+                        action = "append",
+                        default = [],
+                        metavar = "FILE",
+                        help = "A distance table built with distance_table.py. "
+                               "Can be given several times, for different "
+                               "sizes")
+    parser.add_argument("--stats",
+                        action = "store_true",
+                        help = "Add all the counters of the search to every result")
+    parser.add_argument("--deadline",
+                        type = float,
+                        metavar = "SECONDS",
+                        help = "How long the search of a stack may run")
+    parser.add_argument("--max-expansions",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of nodes the search of a stack may "
+                               "expand")
+    parser.add_argument("--max-frontier",
+                        type = int,
+                        metavar = "N",
+                        help = "The number of states the frontier of a search "
+                               "may hold")
+    parser.add_argument("--max-memory",
+                        type = float,
+                        metavar = "MIB",
+                        help = "The memory a worker may use while it searches")
+    parser.add_argument("--complete",
+                        action = "store_true",
+                        help = "Sort the stacks whose search ran out of budget "
+                               "greedily, instead of giving an error")
+    args = parser.parse_args()
+    limits = (args.deadline, args.max_expansions, args.max_frontier,
+              args.max_memory)
+    try:
+        check_distance_tables(args.distances)
+        Budget(*limits)
+    except ValueError as error:
+        parser.error(str(error))
+
+    workers = args.workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=start_worker,
+            initargs=(args.engine, args.heuristic, args.pdb, args.table_size,
+                      args.cache, args.stats, args.queue,
+                      args.distances, limits, args.complete)) as pool:
+        service = SolverService(pool)
+        try:
+            asyncio.run(serve(service, args.socket, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
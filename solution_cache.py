@@ -0,0 +1,207 @@
+"""
+Solution Cache
+--------------
+Remembers the flips that sort a stack so that the same stack (or an
+equivalent one) never has to be searched twice.
+
+Two stacks are equivalent when they have the same solutions:
+* Stacks that only differ by an offset (e.g. 2 3 1 4 and 12 13 11 14) are
+  flipped the same way, so every stack is first renumbered so that the
+  pancakes are 1 to n - 1 and the plate is n.
+* A stack can be read as a permutation (the pancake at each position). If
+  a sequence of flips sorts a stack, the same flips in the reverse order
+  sort the inverse permutation (the position of each pancake), for the
+  same cost, since every flip is its own inverse.
+The key of a stack is the smaller of the renumbered stack and its inverse,
+so both share one entry. Since the flips do not depend on the numbers of
+the pancakes, they are replayed on the stack of the caller.
+
+Lookups go to an in-process LRU cache first, then to an optional sqlite
+file that is shared between runs (and between processes). Both have a
+maximum number of entries; the least recently used entries are evicted.
+Only optimal solutions should be stored, since every engine that uses the
+cache expects one.
+"""
+
+import collections          # Ordered Dictionary for the LRU Cache
+import sqlite3              # On-Disk Store
+
+
+def canonical(stack):
+    """
+    Args
+    ----
+    stack: list or tuple
+        A valid stack of pancakes (see pancake.check_stack)
+
+    Returns
+    -------
+    key: bytes
+        The key shared by every stack equivalent to this one
+
+    inverted: boolean
+        True if the key is the inverse of the stack, in which case the
+        flips of the key must be reversed
+    """
+    size = len(stack)
+    offset = stack[-1] - size
+    permutation = [pancake - offset for pancake in stack]
+    inverse = [0] * size
+    for position, pancake in enumerate(permutation):
+        inverse[pancake - 1] = position + 1
+    if inverse < permutation:
+        return bytes(inverse), True
+    return bytes(permutation), False
+
+
+"""
+SolutionCache Class
+-------------------
+An LRU cache of solutions in memory, in front of an optional sqlite file.
+"""
+class SolutionCache():
+    def __init__(self, path=None, memory_size=10000, disk_size=1000000):
+        """
+        Args
+        ----
+        path: string
+            The sqlite file. If None, only the in-memory cache is used.
+
+        memory_size: int
+            The maximum number of solutions kept in memory
+
+        disk_size: int
+            The maximum number of solutions kept in the file
+        """
+        self.memory = collections.OrderedDict()
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = None
+        if path is not None:
+            # Several processes may share the file, so wait for locks
+            # instead of failing
+            self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                            "key BLOB PRIMARY KEY, flips BLOB NOT NULL, "
+                            "used INTEGER NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS solutions_used "
+                            "ON solutions (used)")
+            self.disk_count = self.db.execute(
+                "SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+
+    def get(self, stack):
+        """
+        Args
+        ----
+        stack: list or tuple
+            A valid stack of pancakes
+
+        Returns
+        -------
+        list
+            The depth of each flip that sorts the stack, or None if the
+            stack is not in the cache
+        """
+        key, inverted = canonical(stack)
+        flips = self.memory.get(key)
+        if flips is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+        elif self.db is not None:
+            row = self.db.execute("SELECT flips FROM solutions WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is not None:
+                flips = bytes(row[0])
+                self.db.execute("UPDATE solutions SET used = "
+                                "(SELECT COALESCE(MAX(used), 0) + 1 FROM solutions) "
+                                "WHERE key = ?", (key,))
+                self.remember(key, flips)
+                self.disk_hits += 1
+        if flips is None:
+            self.misses += 1
+            return None
+        flips = list(flips)
+        if inverted:
+            flips.reverse()
+        return flips
+
+
+    def put(self, stack, flips):
+        """
+        Stores the solution of a stack.
+
+        Args
+        ----
+        stack: list or tuple
+            A valid stack of pancakes
+
+        flips: list
+            The depth of each flip of an optimal solution of the stack
+        """
+        key, inverted = canonical(stack)
+        flips = list(flips)
+        if inverted:
+            flips.reverse()
+        flips = bytes(flips)
+        self.remember(key, flips)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO solutions (key, flips, used) "
+                            "VALUES (?, ?, (SELECT COALESCE(MAX(used), 0) + 1 "
+                            "FROM solutions))", (key, flips))
+            self.disk_count += 1
+            if self.disk_count > self.disk_size:
+                self.evict()
+
+
+    def evict(self):
+        """
+        Deletes the least recently used solutions from the file. Counting
+        the rows is slow, so the file is cut down to 90% of its maximum size
+        at once, and the count is only an estimate in between (other
+        processes may write to the same file).
+        """
+        count = self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        if count > self.disk_size:
+            excess = count - self.disk_size * 9 // 10
+            self.db.execute("DELETE FROM solutions WHERE key IN (SELECT key "
+                            "FROM solutions ORDER BY used LIMIT ?)", (excess,))
+            self.evictions += excess
+            count -= excess
+        self.disk_count = count
+
+
+    def remember(self, key, flips):
+        """
+        Adds a solution to the in-memory cache, evicting the least recently
+        used solution if the cache is full.
+        """
+        self.memory[key] = flips
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+
+    def counters(self):
+        """
+        Returns
+        -------
+        dict
+            The number of hits (in memory and on disk), misses and evictions
+        """
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
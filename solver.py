@@ -0,0 +1,355 @@
+"""
+Solver Library
+--------------
+Solves a stack of pancakes from Python code, without printing or exiting.
+solve() checks the stack, runs the chosen engine (or looks the stack up in
+a distance table or a solution cache) and returns a SolveResult with the
+flips, the cost, the counters of the search and the time it took.
+Invalid stacks raise InvalidStackError, and invalid options (an unknown
+engine or heuristic) raise ValueError. steps() yields the steps of the
+solution one at a time.
+
+With a budget (see pancake.Budget), a search that reaches its limits
+returns a result marked as exceeded, with the lower bound of the optimal
+cost that the search proved, and, if complete is set, a solution found
+greedily from the stack, whose bound is its cost divided by the lower
+bound.
+
+    from solver import solve
+    result = solve([3, 1, 2, 4], engine="ida", heuristic="landmark")
+    print(result.flips, result.cost)
+
+pancake.py, pancake_ucs.py and batch.py are wrappers around it.
+"""
+
+import logging              # For Debugging Functions
+import timeit               # Timing
+
+from heuristics import make_heuristic
+from pancake import (InvalidStackError, check_stack, flip, greedy_flips,
+                     make_search)
+from stats import SearchStats
+
+
+class NoSolutionError(Exception):
+    """
+    Raised by steps() when a search ends without a solution (e.g. when its
+    budget runs out)
+    """
+
+
+"""
+SolveResult Class
+-----------------
+The outcome of solve().
+"""
+class SolveResult():
+    __slots__ = ("stack", "flips", "cost", "bound", "stats", "time",
+                 "source", "exceeded", "lower_bound")
+
+    def __init__(self, stack, flips, cost, bound=1, stats=None, time=0.0,
+                 source="search", exceeded=False, lower_bound=None):
+        """
+        Args
+        ----
+        stack: tuple
+            The stack that was solved
+
+        flips: list
+            The depth of each flip of the solution, or None if no solution
+            was found
+
+        cost: int
+            The cost of the solution, or None
+
+        bound: float
+            The solution costs at most bound times the optimal cost (1 for
+            an optimal solution)
+
+        stats: SearchStats object
+            The counters of the search (all 0 if there was no search)
+
+        time: float
+            How long solving took, in seconds
+
+        source: string
+            "search", "cache" (found in the solution cache), "table"
+            (found in a distance table) or "greedy" (completed greedily
+            after the budget ran out)
+
+        exceeded: boolean
+            Whether the search ran out of budget before it was done
+
+        lower_bound: int
+            If the budget ran out, the least cost a solution can have, as
+            far as the search got
+        """
+        self.stack = stack
+        self.flips = flips
+        self.cost = cost
+        self.bound = bound
+        self.stats = stats if stats is not None else SearchStats()
+        self.time = time
+        self.source = source
+        self.exceeded = exceeded
+        self.lower_bound = lower_bound
+
+
+    @property
+    def solved(self):
+        """
+        True if a solution was found
+        """
+        return self.flips is not None
+
+
+    def steps(self):
+        """
+        Yields
+        ------
+        (int, tuple)
+            The depth of each flip and the stack after it, computed one
+            step at a time
+        """
+        state = self.stack
+        for flip_depth in self.flips:
+            state = flip(state, flip_depth)
+            yield flip_depth, state
+
+
+    def as_dict(self, with_stats=False):
+        """
+        Returns
+        -------
+        dict
+            The result as it is written as JSON by batch.py: the stack, the
+            flips and the cost (or an error), whether it came from the
+            cache or a distance table, the number of nodes expanded and the
+            time. If the budget ran out, the result is marked as exceeded
+            and has the lower bound of the optimal cost.
+        """
+        result = {"stack": list(self.stack)}
+        if self.flips is None:
+            result["error"] = ("Budget exceeded" if self.exceeded
+                               else "No solution found")
+        else:
+            result["flips"] = self.flips
+            result["cost"] = self.cost
+        if self.bound != 1:
+            result["bound"] = self.bound
+        if self.exceeded:
+            result["budget_exceeded"] = True
+            result["lower_bound"] = self.lower_bound
+        if self.source == "cache":
+            result["cached"] = True
+        elif self.source == "table":
+            result["exact"] = True
+        else:
+            result["expanded"] = self.stats.expanded
+            if with_stats:
+                result["stats"] = self.stats.as_dict()
+        result["time"] = self.time
+        return result
+
+
+def check(stack):
+    """
+    Checks a stack given by a caller.
+
+    Returns
+    -------
+    tuple
+        The stack
+
+    Raises
+    ------
+    InvalidStackError
+        If the stack is not a list of integers that can be sorted
+    """
+    try:
+        if any(type(pancake) is not int for pancake in stack):
+            raise InvalidStackError("The stack should only contain integers.")
+    except TypeError:
+        raise InvalidStackError("The stack should be a list of integers.")
+    error = check_stack(stack)
+    if error is not None:
+        raise InvalidStackError(error)
+    return tuple(stack)
+
+
+def solve(stack, *, engine="astar", heuristic="gap", budget=None,
+          cost="depth", pdb_paths=(), distances=None, cache=None,
+          timed=False, on_solution=None, complete=False, **options):
+    """
+    Solves a stack of pancakes.
+
+    Args
+    ----
+    stack: list or tuple
+        The stack of pancakes, the plate (the largest number) last
+
+    engine: string
+        The search algorithm (see pancake.ENGINES)
+
+    heuristic: string or heuristic object
+        The name of a heuristic (see heuristics.HEURISTICS), or a
+        heuristic object that is used as it is (e.g. one loaded once for
+        many stacks)
+
+    budget: Budget object
+        The limits of the search (see pancake.Budget). The anytime engine
+        returns its best solution when they are reached; the other
+        engines return a result marked as exceeded.
+
+    cost: string
+        "depth" or "unit" (see pancake.COSTS)
+
+    pdb_paths: list
+        The pattern databases of the "pdb" and "max" heuristics
+
+    distances: DistanceTable object
+        A distance table (see distance_table.py). Stacks of its size are
+        solved from it without searching.
+
+    cache: SolutionCache object
+        A solution cache (see solution_cache.py) that is looked up before
+        searching, and where optimal solutions are stored
+
+    timed: boolean
+        Whether the heuristic and the frontier are timed (see stats.py)
+
+    on_solution: function
+        Called by the anytime engine with every better solution (a node)
+        and its bound
+
+    complete: boolean
+        Whether a search that ran out of budget returns a solution found
+        greedily (see pancake.greedy_flips) instead of no solution
+
+    options:
+        The other arguments of pancake.make_search (queue, table_size,
+        workers, weight, weight_step, spill_dir, run_size,
+        prune_moves)
+
+    Returns
+    -------
+    SolveResult object
+
+    Raises
+    ------
+    InvalidStackError
+        If the stack cannot be sorted
+
+    ValueError
+        If an option is not valid
+    """
+    stack = check(stack)
+    if isinstance(heuristic, str):
+        try:
+            heuristic = make_heuristic(heuristic, pdb_paths, len(stack))
+        except OSError as error:
+            raise ValueError(str(error))
+    if distances is not None and distances.unit != (cost == "unit"):
+        raise ValueError(distances.path + " is not for the " + str(cost)
+                         + " cost")
+    if cache is not None and cost == "unit":
+        raise ValueError("The solution cache only holds solutions for the "
+                         "depth cost")
+    stats = SearchStats(timed=timed)
+    search = make_search(engine, stack, heuristic, stats=stats, budget=budget,
+                         cost=cost, **options)
+    if on_solution is not None:
+        search.on_solution = on_solution
+
+    timer_start = timeit.default_timer()
+    flips = None
+    source = "search"
+    if distances is not None:
+        flips = distances.solve(stack)
+        source = "table"
+    if flips is None and cache is not None:
+        flips = cache.get(stack)
+        source = "cache"
+        logging.debug("Cache counters: %s", cache.counters())
+    bound = 1
+    lower_bound = None
+    if flips is None:
+        source = "search"
+        search.run()
+        flips = search.solution_flips()
+        if flips is not None:
+            bound = search.bound
+        if search.exceeded:
+            lower_bound = search.lower_bound()
+            if complete:
+                flips = greedy_flips(stack, search.heuristic)
+                source = "greedy"
+                bound = path_cost(flips, cost) / max(1, lower_bound)
+        if flips is not None and cache is not None and bound == 1:
+            cache.put(stack, flips)
+    timer_stop = timeit.default_timer()
+
+    solution_cost = None if flips is None else path_cost(flips, cost)
+    return SolveResult(stack, flips, solution_cost, bound, stats,
+                       timer_stop - timer_start, source, search.exceeded,
+                       lower_bound)
+
+
+def path_cost(flips, cost="depth"):
+    """
+    Returns
+    -------
+    int
+        The cost of a list of flips: the number of pancakes flipped, or the
+        number of flips if cost is "unit"
+    """
+    if cost == "unit":
+        return len(flips)
+    return sum(flips)
+
+
+def steps(stack, **options):
+    """
+    Solves a stack (see solve()) and yields the steps of the solution one
+    at a time.
+
+    Yields
+    ------
+    (int, tuple)
+        The depth of each flip and the stack after it
+
+    Raises
+    ------
+    NoSolutionError
+        If no solution was found
+    """
+    result = solve(stack, **options)
+    if not result.solved:
+        raise NoSolutionError("No solution found")
+    yield from result.steps()
+
+
+def print_result(result):
+    """
+    Prints the steps of a solution, as pancake.py does.
+    """
+    if not result.solved:
+        if result.exceeded:
+            print("The budget ran out before a solution was found (the "
+                  "optimal cost is at least", str(result.lower_bound) + ")")
+        else:
+            print("No solution found")
+        return
+    if not result.flips:
+        print("Your stack of pancakes is already sorted!")
+        return
+    print("To sort the stack", list(result.stack), "do the following:")
+    for step, (flip_depth, state) in enumerate(result.steps(), 1):
+        print("Step", step, ": Flip the top", flip_depth,
+              "pancakes to get", list(state))
+    if result.bound != 1:
+        print("Cost:", result.cost, "(at most", round(result.bound, 3),
+              "times the optimal cost)")
+    if result.source == "greedy":
+        print("The budget ran out, so this solution was found greedily "
+              "(the optimal cost is at least", str(result.lower_bound) + ")")
@@ -0,0 +1,167 @@
+"""
+Search Statistics
+-----------------
+Every engine keeps a SearchStats object with counters of what it did:
+nodes expanded and generated, children that were never generated because
+a move pruning rule skipped their flip, children that were duplicates of
+states already reached as cheaply, states taken back out of the visited set
+(reopened), pushes and pops of the frontier (including stale entries),
+and the largest sizes of the frontier (open) and visited (closed) sets.
+
+The counters are plain integers, so keeping them costs next to nothing.
+Measuring where the time goes is more expensive, so it is only done when
+the stats are created with timed=True: the heuristic and the frontier are
+then wrapped in objects that time every call, and the rest of the search
+time is counted as expansion time. Without timing, nothing is wrapped and
+the search runs exactly as before.
+"""
+
+import timeit               # Timing
+
+
+"""
+SearchStats Class
+-----------------
+The counters of one search.
+"""
+class SearchStats():
+    __slots__ = ("timed", "expanded", "generated", "pruned", "duplicates",
+                 "reopened", "pushes", "pops", "peak_open", "peak_closed",
+                 "search_time", "heuristic_time", "queue_time")
+
+    def __init__(self, timed=False):
+        """
+        Args
+        ----
+        timed: boolean
+            Whether the time spent in the heuristic and the frontier is
+            measured
+        """
+        self.timed = timed
+        self.expanded = 0
+        self.generated = 0
+        self.pruned = 0
+        self.duplicates = 0
+        self.reopened = 0
+        self.pushes = 0
+        self.pops = 0
+        self.peak_open = 0
+        self.peak_closed = 0
+        self.search_time = 0.0
+        self.heuristic_time = 0.0
+        self.queue_time = 0.0
+
+
+    def as_dict(self):
+        """
+        Returns
+        -------
+        dict
+            The counters (and the times, if they were measured)
+        """
+        result = {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "pruned": self.pruned,
+            "duplicates": self.duplicates,
+            "reopened": self.reopened,
+            "pushes": self.pushes,
+            "pops": self.pops,
+            "peak_open": self.peak_open,
+            "peak_closed": self.peak_closed,
+            "search_time": self.search_time,
+        }
+        if self.timed:
+            result["heuristic_time"] = self.heuristic_time
+            result["queue_time"] = self.queue_time
+            result["expansion_time"] = (self.search_time - self.heuristic_time
+                                        - self.queue_time)
+        return result
+
+
+    def __str__(self):
+        """
+        Printing for the --stats option
+        """
+        lines = []
+        for name, value in self.as_dict().items():
+            if isinstance(value, float):
+                value = str(round(value, 4)) + " s"
+            lines.append(name.replace("_", " ").capitalize() + ": " + str(value))
+        return "\n".join(lines)
+
+
+"""
+TimedHeuristic Class
+--------------------
+Wraps a heuristic and adds the time spent in it to the stats.
+"""
+class TimedHeuristic():
+    def __init__(self, heuristic, stats):
+        self.heuristic = heuristic
+        self.stats = stats
+
+
+    def __call__(self, state):
+        timer_start = timeit.default_timer()
+        h = self.heuristic(state)
+        self.stats.heuristic_time += timeit.default_timer() - timer_start
+        return h
+
+
+    def after_flip(self, state, h, flip_depth, flipped):
+        timer_start = timeit.default_timer()
+        h = self.heuristic.after_flip(state, h, flip_depth, flipped)
+        self.stats.heuristic_time += timeit.default_timer() - timer_start
+        return h
+
+
+"""
+TimedQueue Class
+----------------
+Wraps a priority queue and adds the time spent in it to the stats. Other
+attributes (e.g. the heap) are read from the wrapped queue.
+"""
+class TimedQueue():
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+
+
+    def __getattr__(self, name):
+        return getattr(self.queue, name)
+
+
+    def __str__(self):
+        return str(self.queue)
+
+
+    def timed(self, method, *args):
+        timer_start = timeit.default_timer()
+        result = method(*args)
+        self.stats.queue_time += timeit.default_timer() - timer_start
+        return result
+
+
+    def put(self, node):
+        return self.timed(self.queue.put, node)
+
+
+    def get(self):
+        return self.timed(self.queue.get)
+
+
+    def peek(self):
+        return self.timed(self.queue.peek)
+
+
+    def has(self, state):
+        return self.timed(self.queue.has, state)
+
+
+    def replace(self, new_node):
+        return self.timed(self.queue.replace, new_node)
+
+
+    def empty(self):
+        return self.timed(self.queue.empty)
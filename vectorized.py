@@ -0,0 +1,219 @@
+"""
+Vectorized Expansion
+--------------------
+An A* search that builds children with NumPy instead of one flip at a
+time. Every flip is a fixed permutation of the positions of the stack, so
+the permutations of all the flip depths are computed once, as the rows of
+an index array. Indexing a 2D array of parent states with it gives every
+child of every parent in one operation.
+
+Nodes are expanded in batches: every node that has the least total cost in
+the frontier (up to BATCH_SIZE of them) is popped and expanded together.
+This is safe because all the heuristics here are consistent: a child never
+has a lower total cost than its parent, so no node of the batch can be
+reached more cheaply through another node of the batch.
+
+With the gap heuristic, the heuristic of every child is derived from the
+heuristic of its parent with array operations (see gap_after_flip). Each
+child is then viewed as a single fixed-size key, and children of the batch
+that are the same stack are dropped (keeping the cheapest) before anything
+is done in Python. Only the remaining children are turned into tuples and
+nodes and checked against the visited states and the frontier. With other
+heuristics, the children are still built with NumPy but their heuristic is
+computed one at a time.
+
+NumPy is only needed for this engine.
+"""
+
+import logging              # For Debugging Functions
+
+import numpy as np          # Arrays of States
+
+from heuristics import GapHeuristic
+from pancake import BudgetExceeded, Node, astar
+from stats import TimedHeuristic
+
+# The largest number of nodes expanded together
+BATCH_SIZE = 64
+
+
+def flip_indices(length):
+    """
+    Args
+    ----
+    length: int
+        The length of the stacks, including the plate
+
+    Returns
+    -------
+    numpy array
+        One row per flip depth, from 2 to length - 1: the position in the
+        parent state of each pancake of the child state
+    """
+    rows = []
+    for flip_depth in range(2, length):
+        rows.append(list(range(flip_depth - 1, -1, -1))
+                    + list(range(flip_depth, length)))
+    return np.array(rows, dtype=np.intp)
+
+
+"""
+vectorized Class
+----------------
+Runs A* and expands batches of nodes of equal total cost with NumPy.
+"""
+class vectorized(astar):
+    def __init__(self, initial_state, heuristic=None, stats=None,
+                 queue="heap", batch_size=BATCH_SIZE):
+        """
+        Args
+        ----
+        initial_state, heuristic, stats, queue:
+            See astar
+
+        batch_size: int
+            The largest number of nodes expanded together
+        """
+        super().__init__(initial_state, heuristic, stats, queue)
+        self.batch_size = batch_size
+        self.flips = flip_indices(self.length)
+        self.flip_depths = np.arange(2, self.length)
+        # The smallest type that holds every pancake, so that the key of a
+        # state is as short as possible
+        self.dtype = np.result_type(np.min_scalar_type(min(initial_state)),
+                                    np.min_scalar_type(max(initial_state)))
+        heuristic = self.heuristic
+        if isinstance(heuristic, TimedHeuristic):
+            heuristic = heuristic.heuristic
+        self.vector_gap = isinstance(heuristic, GapHeuristic)
+
+
+    def explore(self):
+        """
+        Runs the A* search, popping every node of least total cost at once
+        """
+        stats = self.stats
+        frontier = self.frontier
+        on_expand = self.on_expand
+        budget = self.budget
+        # The nodes expanded since the budget was last checked
+        expanded = 1
+        while True:
+            # If our frontier is empty and we haven't yet encountered a goal
+            # state, that means there is no solution
+            if frontier.empty():
+                self.solution = False
+                return
+            if budget is not None and budget.exceeded(
+                    stats, len(frontier.index), expanded):
+                raise BudgetExceeded
+
+            batch = [frontier.get()]
+            cost = batch[0].cost
+            while (len(batch) < self.batch_size and not frontier.empty()
+                   and frontier.peek().cost == cost):
+                batch.append(frontier.get())
+
+            for node in batch:
+                self.visited.add(node.state)
+            for node in batch:
+                if node.forward_cost == 0 and node.state == self.goal:
+                    self.solution = node
+                    return
+
+            if on_expand is not None:
+                for node in batch:
+                    on_expand(node)
+            self.expand_batch(batch)
+            expanded = len(batch)
+            stats.expanded += expanded
+            if len(frontier.index) > stats.peak_open:
+                stats.peak_open = len(frontier.index)
+
+
+    def expand_batch(self, batch):
+        """
+        Adds every child of a batch of nodes to the frontier.
+
+        Args
+        ----
+        batch: list
+            The nodes to expand, which all have the same total cost
+        """
+        stats = self.stats
+        length = self.length
+        width = length - 2
+        parents = np.array([node.state for node in batch], dtype=self.dtype)
+        children = parents[:, self.flips].reshape(-1, length)
+        stats.generated += len(children)
+
+        if self.vector_gap:
+            # The flip of depth k only changes the adjacency of the pancakes
+            # at positions k - 1 and k (see gap_after_flip)
+            signed = parents.astype(np.int32)
+            below = signed[:, 2:]
+            h_before = np.array([node.forward_cost for node in batch])
+            forward_costs = (h_before[:, None]
+                             - (np.abs(signed[:, 1:-1] - below) != 1)
+                             + (np.abs(signed[:, :1] - below) != 1)).ravel()
+
+        backward_costs = (np.array([node.backward_cost for node in batch])
+                          [:, None] + self.flip_depths).ravel()
+
+        # The children of one node are all different, but the children of
+        # a batch can be the same stack. Keep the cheapest of each.
+        if len(batch) > 1:
+            keys = np.ascontiguousarray(children).view(
+                np.dtype((np.void, children.itemsize * length))).ravel()
+            order = np.argsort(backward_costs, kind="stable")
+            first = np.unique(keys[order], return_index=True)[1]
+            keep = np.sort(order[first])
+            stats.duplicates += len(children) - len(keep)
+        else:
+            keep = np.arange(len(children))
+
+        states = children[keep].tolist()
+        parent_indices = (keep // width).tolist()
+        flip_depths = (keep % width + 2).tolist()
+        backward_costs = backward_costs[keep].tolist()
+        if self.vector_gap:
+            forward_costs = forward_costs[keep].tolist()
+        else:
+            forward_costs = [None] * len(keep)
+
+        visited = self.visited
+        frontier = self.frontier
+        index = frontier.index
+        heuristic = self.heuristic
+        for state, parent_index, flip_depth, backward_cost, forward_cost in zip(
+                states, parent_indices, flip_depths, backward_costs,
+                forward_costs):
+            state = tuple(state)
+
+            # Skip the children whose state was visited or is already in the
+            # frontier as cheaply, without creating a node
+            if state in visited:
+                stats.duplicates += 1
+                self.order_added += 1
+                continue
+            known = index.get(state)
+            if known is not None and known <= backward_cost:
+                stats.duplicates += 1
+                self.order_added += 1
+                continue
+
+            parent = batch[parent_index]
+            if forward_cost is None:
+                forward_cost = heuristic.after_flip(parent.state,
+                                                    parent.forward_cost,
+                                                    flip_depth, state)
+            child = Node(state, parent, self.order_added, flip_depth,
+                         forward_cost)
+            if self.debug:
+                logging.debug("Flipped %s at depth %d to get %s",
+                              parent.state, flip_depth, state)
+
+            # A cheaper node replaces the node in the frontier, which is
+            # then skipped by get()
+            frontier.put(child)
+            self.order_added += 1